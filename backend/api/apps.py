@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .db import check_connections
+        from .links import link_deleted
+        from .models import ShortLink
+        from .search import register_sqlite_functions
+        connection_created.connect(register_sqlite_functions)
+        request_started.connect(check_connections)
+        post_delete.connect(link_deleted, sender=ShortLink)
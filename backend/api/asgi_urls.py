@@ -0,0 +1,25 @@
+from django.urls import URLPattern, include, path
+
+from . import urls
+from .async_views import ASYNC_READ_VIEWS, offload_reads
+from .urls import router
+
+
+def offload_read_views(patterns):
+    # Views are swapped in place: the router orders list actions such
+    # as recipes/feed/ before recipes/<pk>/, and that order must hold.
+    return [
+        URLPattern(pattern.pattern,
+                   offload_reads(pattern.callback),
+                   pattern.default_args,
+                   pattern.name)
+        if pattern.name in ASYNC_READ_VIEWS else pattern
+        for pattern in patterns
+    ]
+
+
+urlpatterns = [
+    path('', include(offload_read_views(router.urls))),
+    *(pattern for pattern in urls.urlpatterns
+      if getattr(pattern, 'urlconf_name', None) is not router.urls),
+]
@@ -0,0 +1,52 @@
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import redirect
+from rest_framework.permissions import SAFE_METHODS
+
+from .db import check_connections
+from .instrumentation import current_metrics, instrument_connections
+from .links import get_link_recipe_id, recipe_redirect_url
+
+# Django 3.2 has no async ORM, so database work runs in worker threads.
+# Safe requests leave the single thread shared by sync code and run
+# concurrently; every thread closes its connection like a request would.
+ASYNC_READ_VIEWS = ('recipe-list', 'recipe-detail',
+                    'tag-list', 'tag-detail',
+                    'ingredient-list', 'ingredient-detail')
+
+
+def run_in_thread(func, *args, **kwargs):
+    check_connections()
+    if current_metrics.get() is not None:
+        instrument_connections()
+    try:
+        result = func(*args, **kwargs)
+        if callable(getattr(result, 'render', None)):
+            result.render()
+        return result
+    finally:
+        close_old_connections()
+
+
+def offload(func, thread_sensitive=False):
+    return sync_to_async(partial(run_in_thread, func),
+                         thread_sensitive=thread_sensitive)
+
+
+def offload_reads(view):
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        run = offload(view, thread_sensitive=(request.method
+                                              not in SAFE_METHODS))
+        return await run(request, *args, **kwargs)
+    return async_view
+
+
+async def recipe_link(request, slug):
+    recipe_id = await offload(get_link_recipe_id)(slug)
+    if recipe_id is None:
+        raise Http404
+    return redirect(recipe_redirect_url(recipe_id))
@@ -0,0 +1,93 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import router
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from recipes.models import Recipe
+from recipes.versions import get_versions, user_version_name
+
+STATE_ATTRIBUTE = '_conditional_state'
+
+
+def get_user_names(request):
+    if not request.user.is_authenticated:
+        return ()
+    return (user_version_name(request.user.pk),)
+
+
+def make_state(parts, timestamps):
+    etag = hashlib.md5(
+        '|'.join(str(part) for part in (*parts, *timestamps)).encode()
+    ).hexdigest()
+    last_modified = datetime.fromtimestamp(max(timestamps), tz=timezone.utc)
+    return etag, last_modified
+
+
+def tag_list_state(request, *args, **kwargs):
+    return make_state((request.get_full_path(),), get_versions('tags'))
+
+
+def ingredient_list_state(request, *args, **kwargs):
+    return make_state((request.get_full_path(),),
+                      get_versions('ingredients'))
+
+
+def recipe_list_state(request, *args, **kwargs):
+    names = ('recipes', 'tags', 'ingredients', 'users')
+    if request.GET.get('ordering') == 'popular':
+        names += ('favorites',)
+    return make_state(
+        (request.get_full_path(), request.user.pk),
+        get_versions(*names, *get_user_names(request))
+    )
+
+
+def recipe_detail_state(request, *args, pk=None, **kwargs):
+    # The router accepts any pk, the view answers 404 to one that is
+    # not a number.
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    # A lagging replica would tag the current versions with an old
+    # updated_at.
+    updated_at = (Recipe.objects.using(router.db_for_write(Recipe))
+                  .filter(pk=pk)
+                  .values_list('updated_at', flat=True)
+                  .first())
+    if updated_at is None:
+        return None
+    return make_state(
+        (pk, request.user.pk),
+        (updated_at.timestamp(),
+         *get_versions('tags', 'ingredients', 'users',
+                       *get_user_names(request)))
+    )
+
+
+def conditional(state_func):
+    def get_state(request, *args, **kwargs):
+        # Versions kept in a process-local cache differ between
+        # workers, an ETag from one of them could be confirmed by
+        # another one that has not seen the change.
+        if not settings.CACHE_SHARED:
+            return None
+        if not hasattr(request, STATE_ATTRIBUTE):
+            setattr(request, STATE_ATTRIBUTE,
+                    state_func(request, *args, **kwargs))
+        return getattr(request, STATE_ATTRIBUTE)
+
+    def etag_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state and state[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state and state[1]
+
+    return method_decorator(
+        condition(etag_func=etag_func, last_modified_func=last_modified_func)
+    )
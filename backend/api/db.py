@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+REPLICA_PATH_PREFIX = '/api/'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """Отправляет чтения безопасных запросов к API на реплику."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and REPLICA in connections:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != REPLICA
+
+
+@contextmanager
+def route_reads(request):
+    token = replica_reads.set(
+        request.method in SAFE_METHODS
+        and request.path.startswith(REPLICA_PATH_PREFIX)
+    )
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    # For reads that outlive the request, such as cache fills: a lagging
+    # replica would store stale data under the current cache versions.
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def check_connections(**kwargs):
+    # Django 3.2 does not support CONN_HEALTH_CHECKS yet, persistent
+    # connections that went away are dropped here before they are reused.
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not connection.is_usable()):
+            connection.close()
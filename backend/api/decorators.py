@@ -1,11 +1,36 @@
 from functools import wraps
 
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 
+from recipes.counters import change_counter
 
-def m2m_set(related_manager_name, already_added_err):
+
+def through_kwargs(manager, obj):
+    return {manager.source_field_name: manager.instance,
+            manager.target_field_name: obj}
+
+
+def send_m2m_changed(manager, obj, action):
+    # Through rows are written directly to detect duplicates, and Django
+    # sends no save/delete signals for auto-created through models, so
+    # the signals add()/remove() would send are sent by hand.
+    m2m_changed.send(
+        sender=manager.through,
+        instance=manager.instance,
+        action=action,
+        reverse=manager.reverse,
+        model=manager.model,
+        pk_set={obj.pk},
+        using=router.db_for_write(manager.through,
+                                  instance=manager.instance)
+    )
+
+
+def m2m_set(related_manager_name, already_added_err, counter_field=None):
     def m2m_set_wrapper(func):
         @wraps(func)
         def inner(*args, **kwargs):
@@ -13,10 +38,17 @@ def m2m_set(related_manager_name, already_added_err):
             request = args[1]
             obj = view.get_object()
             manager = getattr(request.user, related_manager_name)
-            if obj in manager.all():
-                raise ValidationError(already_added_err)
             func(*args, **kwargs)
-            manager.add(obj)
+            try:
+                with transaction.atomic():
+                    manager.through.objects.create(
+                        **through_kwargs(manager, obj)
+                    )
+                    if counter_field:
+                        change_counter(type(obj), obj.pk, counter_field, 1)
+                    send_m2m_changed(manager, obj, 'post_add')
+            except IntegrityError:
+                raise ValidationError(already_added_err)
             serializer = view.get_serializer(instance=obj,
                                              context={'request': request})
             return Response(serializer.data,
@@ -25,7 +57,8 @@ def m2m_set(related_manager_name, already_added_err):
     return m2m_set_wrapper
 
 
-def m2m_unset(related_manager_name, delete_nonexist_err):
+def m2m_unset(related_manager_name, delete_nonexist_err,
+              counter_field=None):
     def m2m_unset_wrapper(func):
         @wraps(func)
         def inner(*args, **kwargs):
@@ -33,10 +66,17 @@ def m2m_unset(related_manager_name, delete_nonexist_err):
             request = args[1]
             obj = view.get_object()
             manager = getattr(request.user, related_manager_name)
-            if obj not in manager.all():
-                raise ValidationError(delete_nonexist_err)
             func(*args, **kwargs)
-            manager.remove(obj)
+            with transaction.atomic():
+                send_m2m_changed(manager, obj, 'pre_remove')
+                deleted, _ = manager.through.objects.filter(
+                    **through_kwargs(manager, obj)
+                ).delete()
+                if not deleted:
+                    raise ValidationError(delete_nonexist_err)
+                if counter_field:
+                    change_counter(type(obj), obj.pk, counter_field, -1)
+                send_m2m_changed(manager, obj, 'post_remove')
             return Response(status=status.HTTP_204_NO_CONTENT)
         return inner
     return m2m_unset_wrapper
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from recipes.reference import get_reference_data
+from .images import get_rendition_urls
 from .utils import get_image_from_base64
 
 
@@ -13,3 +15,39 @@ class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         file = get_image_from_base64(data, self.image_type)
         return super().to_internal_value(file)
+
+
+class ImageRenditionsField(serializers.Field):
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        urls = get_rendition_urls(recipe.image.name, recipe.renditions)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {
+            rendition: {extension: request.build_absolute_uri(url)
+                        for extension, url in formats.items()}
+            for rendition, formats in urls.items()
+        }
+
+
+class ReferencePrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        objects = get_reference_data(self.get_queryset().model).in_bulk()
+        if pk not in objects:
+            self.fail('does_not_exist', pk_value=data)
+        return objects[pk]
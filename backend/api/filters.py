@@ -1,14 +1,17 @@
 from django_filters import rest_framework as filters
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe, Tag, in_user_list
+from .search import search_ingredients
 
 User = get_user_model()
 
 
 class IngredientFilterSet(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        return search_ingredients(queryset, value)
 
     class Meta:
         model = Ingredient
@@ -20,6 +23,9 @@ class RecipeFilterSet(filters.FilterSet):
         ('1', 'True'),
         ('0', 'False')
     )
+    ORDERING_CHOICES = (
+        ('popular', 'Popular'),
+    )
 
     is_favorited = filters.ChoiceFilter(
         field_name='is_favorited_by',
@@ -36,18 +42,34 @@ class RecipeFilterSet(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES,
+        method='filter_ordering'
     )
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', '-pub_date')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.with_any_tag(value)
+
     def filter_method_field(self, queryset, name, value):
+        # Correlated EXISTS instead of a join keeps one row per recipe
+        # whatever other filters are combined with this one.
         if not self.request.user.is_authenticated:
             return queryset
-        query = Q(**{name: self.request.user})
+        in_list = in_user_list(Recipe._meta.get_field(name).through,
+                               self.request.user)
         if value == '1':
-            return queryset.filter(query)
-        return queryset.filter(~query)
+            return queryset.filter(in_list)
+        return queryset.filter(~in_list)
 
     class Meta:
         model = Recipe
         fields = ('is_favorited', 'is_in_shopping_cart',
-                  'author', 'tags')
+                  'author', 'tags', 'ordering')
@@ -0,0 +1,114 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = settings.FOODGRAM['IMAGE_RENDITIONS']
+
+RENDITION_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True,
+             'progressive': True},
+}
+
+RENDITIONS_DIR = 'renditions'
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.FOODGRAM['IMAGE_WORKERS'],
+    thread_name_prefix='foodgram-images'
+)
+
+
+def rendition_name(name, rendition, extension):
+    path = PurePosixPath(name)
+    return str(path.parent / RENDITIONS_DIR
+               / f'{path.stem}_{rendition}.{extension}')
+
+
+def rendition_names(name):
+    return [rendition_name(name, rendition, extension)
+            for rendition in RENDITIONS
+            for extension in RENDITION_FORMATS]
+
+
+def create_renditions(name):
+    with default_storage.open(name) as file, Image.open(file) as image:
+        # Orientation is applied before re-encoding, since EXIF and other
+        # metadata are not copied to the renditions.
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    for rendition, size in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for extension, options in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, **options)
+            target = rendition_name(name, rendition, extension)
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def delete_image(name):
+    for target in (*rendition_names(name), name):
+        default_storage.delete(target)
+
+
+def schedule_image_delete(name):
+    # Files are removed only once the recipe no longer points at them: a
+    # rolled back update must keep its image.
+    if name:
+        transaction.on_commit(lambda: delete_image(name))
+
+
+def get_rendition_urls(name, renditions):
+    # Only sizes recorded on the recipe are linked: the storage is not
+    # asked whether the files exist on every serialization.
+    if not name or not renditions:
+        return None
+    return {
+        rendition: {
+            extension: default_storage.url(
+                rendition_name(name, rendition, extension)
+            )
+            for extension in RENDITION_FORMATS
+        }
+        for rendition in RENDITIONS
+        if rendition in renditions
+    }
+
+
+def renditions_ready(name):
+    # update() sends no signals, so the recipe is touched and the
+    # version bumped here: ETags and cached pages get the new URLs.
+    with transaction.atomic():
+        Recipe.objects.filter(image=name).update(
+            renditions=list(RENDITIONS), updated_at=timezone.now()
+        )
+        bump_version('recipes')
+
+
+def run_create_renditions(name):
+    try:
+        create_renditions(name)
+        renditions_ready(name)
+    except Exception:
+        logger.exception('Не удалось подготовить изображения для %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(name):
+    transaction.on_commit(
+        lambda: executor.submit(run_create_renditions, name)
+    )
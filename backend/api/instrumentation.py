@@ -0,0 +1,202 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = settings.FOODGRAM.get('INSTRUMENTATION', {})
+
+KEY_PREFIX = 'foodgram:metrics'
+
+SLOT_SECONDS = SETTINGS.get('SLOT_SECONDS', 60)
+
+WINDOW_SLOTS = SETTINGS.get('WINDOW_SLOTS', 15)
+
+BUCKETS = {
+    'queries': (1, 2, 5, 10, 20, 50, 100, math.inf),
+    'db': (1, 5, 10, 25, 50, 100, 250, 1000, math.inf),
+    'serializer': (1, 5, 10, 25, 50, 100, 250, 1000, math.inf),
+    'total': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, math.inf),
+}
+
+current_metrics = ContextVar('foodgram_request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        while metrics is not None:
+            metrics.db += elapsed
+            metrics.queries += 1
+            metrics = metrics.parent
+
+
+def instrument_connection(connection, **kwargs):
+    # Connections belong to a thread, and under ASGI the ORM runs in
+    # worker threads: the wrapper stays installed and finds the metrics
+    # of the request through the context, which asgiref carries along.
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def instrument_connections():
+    for connection in connections.all():
+        instrument_connection(connection)
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics(parent=current_metrics.get())
+    token = current_metrics.set(metrics)
+    try:
+        instrument_connections()
+        yield metrics
+    finally:
+        current_metrics.reset(token)
+
+
+@contextmanager
+def query_budget(limit):
+    with collect_metrics() as metrics:
+        yield metrics
+    if metrics.queries > limit:
+        raise QueryBudgetExceeded(
+            f'Выполнено запросов: {metrics.queries}, допустимо: {limit}'
+        )
+
+
+def instrument_serializers():
+    if getattr(BaseSerializer.data, 'instrumented', False):
+        return
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return original(self)
+        # Nested .data calls are already part of the outer timing.
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer += (time.perf_counter() - start) * 1000
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+def get_bucket(metric, value):
+    for bound in BUCKETS[metric]:
+        if value <= bound:
+            return bound
+
+
+def get_slot(timestamp=None):
+    return int((timestamp or time.time()) // SLOT_SECONDS)
+
+
+def bucket_key(endpoint, slot, metric, bound):
+    endpoint = endpoint.replace(' ', ':')
+    return f'{KEY_PREFIX}:{endpoint}:{slot}:{metric}:{bound}'
+
+
+def get_cache():
+    return caches[SETTINGS.get('CACHE', 'default')]
+
+
+def incr(cache, key, timeout):
+    if not cache.add(key, 1, timeout=timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=timeout)
+
+
+def record(endpoint, values):
+    cache = get_cache()
+    slot = get_slot()
+    timeout = SLOT_SECONDS * (WINDOW_SLOTS + 1)
+    endpoints_key = f'{KEY_PREFIX}:endpoints'
+    endpoints = cache.get(endpoints_key, set())
+    if endpoint not in endpoints:
+        cache.set(endpoints_key, endpoints | {endpoint}, timeout=None)
+    for metric, value in values.items():
+        incr(cache,
+             bucket_key(endpoint, slot, metric, get_bucket(metric, value)),
+             timeout)
+
+
+def percentile(histogram, total, rank):
+    if not total:
+        return None
+    seen = 0
+    for bound, count in histogram.items():
+        seen += count
+        if seen >= total * rank:
+            return bound if bound != math.inf else str(bound)
+
+
+def build_report():
+    cache = get_cache()
+    last_slot = get_slot()
+    slots = range(last_slot - WINDOW_SLOTS + 1, last_slot + 1)
+    report = {}
+    for endpoint in sorted(cache.get(f'{KEY_PREFIX}:endpoints', set())):
+        keys = {
+            (metric, bound): [bucket_key(endpoint, slot, metric, bound)
+                              for slot in slots]
+            for metric, bounds in BUCKETS.items()
+            for bound in bounds
+        }
+        values = cache.get_many(
+            [key for slot_keys in keys.values() for key in slot_keys]
+        )
+        endpoint_report = {}
+        for metric, bounds in BUCKETS.items():
+            histogram = {
+                bound: sum(values.get(key, 0)
+                           for key in keys[(metric, bound)])
+                for bound in bounds
+            }
+            total = sum(histogram.values())
+            endpoint_report[metric] = {
+                'count': total,
+                'histogram': {str(bound): count
+                              for bound, count in histogram.items()},
+                'p50': percentile(histogram, total, 0.5),
+                'p95': percentile(histogram, total, 0.95),
+                'p99': percentile(histogram, total, 0.99),
+            }
+        if endpoint_report['total']['count']:
+            report[endpoint] = endpoint_report
+    return report
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ShortLink, link_uri_valid
+
+KEY_PREFIX = 'foodgram:link'
+TIMEOUT = 24 * 60 * 60
+
+
+def link_key(slug):
+    return f'{KEY_PREFIX}:{slug}'
+
+
+def get_link_recipe_id(slug):
+    if not link_uri_valid(slug):
+        return None
+    key = link_key(slug)
+    recipe_id = cache.get(key)
+    if recipe_id is None:
+        recipe_id = (ShortLink.objects
+                     .filter(link_uri=slug)
+                     .values_list('recipe_id', flat=True)
+                     .first())
+        if recipe_id is not None:
+            cache.set(key, recipe_id, TIMEOUT)
+    return recipe_id
+
+
+def recipe_redirect_url(recipe_id):
+    domain = settings.FOODGRAM['REDIRECT_URL']
+    return f'{domain}/recipes/{recipe_id}'
+
+
+def link_deleted(sender, instance, **kwargs):
+    cache.delete(link_key(instance.link_uri))
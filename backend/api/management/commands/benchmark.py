@@ -0,0 +1,365 @@
+import base64
+import io
+import json
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext,
+                               override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api import images
+from api.pagination import DEFAULT_PAGE_SIZE
+from api.search import search_ingredients
+from recipes.models import Ingredient, Recipe, Recipe_Ingredient, Tag
+
+User = get_user_model()
+
+TAG_SLUGS = ('breakfast', 'lunch', 'dinner')
+
+# The benchmark gets its own process-local cache, so it neither reads
+# nor clears the shared cache of a running deployment.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+# Cached list pages are measured both warm and with the cache cleared
+# before every request.
+COLD_SCENARIOS = ('recipe_list_anonymous', 'recipe_list',
+                  'recipe_list_deep_page', 'recipe_list_cursor')
+
+SEARCH_TERMS = ('ing', 'ingredient 1', 'ngredient 42', 'ingrdient')
+
+# Ranked autocomplete against the plain prefix filter it replaced, both
+# measured as bare queries over the same terms.
+SEARCH_QUERIES = {
+    'ingredient_search_istartswith':
+        lambda term: Ingredient.objects.filter(name__istartswith=term),
+    'ingredient_search_ranked':
+        lambda term: search_ingredients(Ingredient.objects.all(), term),
+}
+
+# The shopping list is built by one query whatever the cart size, the
+# two carts show that queries_min/queries_max do not move.
+SMALL_CART = 1
+LARGE_CART = 200
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), 'orange').save(buffer, 'JPEG')
+    return ('data:image/jpeg;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def summarize_latency(durations):
+    durations = sorted(durations)
+
+    def percentile(rank):
+        index = min(len(durations) - 1, round(rank * (len(durations) - 1)))
+        return round(durations[index], 2)
+
+    return {
+        'requests': len(durations),
+        'mean_ms': round(statistics.mean(durations), 2),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(durations[-1], 2),
+    }
+
+
+def summarize(durations, queries):
+    return {
+        **summarize_latency(durations),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Создает тестовую базу с синтетическими данными и измеряет '
+            'время ответа и количество запросов основных эндпоинтов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes-per-user', type=int, default=5)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int,
+                            default=10)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root,
+                                       CACHES=BENCHMARK_CACHES):
+                    self.seed()
+                    results = self.run_benchmarks()
+                    images.executor.shutdown(wait=True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'commit': get_commit(),
+            'database': connection.vendor,
+            'config': {key: options[key] for key in (
+                'users', 'recipes_per_user', 'ingredients',
+                'ingredients_per_recipe', 'favorites_per_user',
+                'cart_per_user', 'subscriptions_per_user',
+                'iterations', 'warmup', 'seed')},
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def sample(self, population, count):
+        return self.random.sample(population, min(count, len(population)))
+
+    def seed(self):
+        options = self.options
+        password = make_password('benchmark')
+        # SQLite does not return primary keys from bulk_create,
+        # so the rows are read back after every insert.
+        User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.com',
+                 first_name='Имя', last_name='Фамилия', password=password)
+            for i in range(options['users'])
+        )
+        self.users = list(User.objects.order_by('pk'))
+        Tag.objects.bulk_create(
+            Tag(name=slug, slug=slug) for slug in TAG_SLUGS
+        )
+        self.tags = list(Tag.objects.all())
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {i}', measurement_unit='г')
+            for i in range(options['ingredients'])
+        )
+        self.ingredients = list(Ingredient.objects.all())
+        for user in self.users:
+            Recipe.objects.bulk_create(
+                Recipe(author=user, name=f'{user.username} recipe {i}',
+                       text='Описание', cooking_time=10,
+                       image='recipes/images/benchmark.jpg')
+                for i in range(options['recipes_per_user'])
+            )
+        self.recipes = list(Recipe.objects.all())
+        Recipe_Ingredient.objects.bulk_create(
+            Recipe_Ingredient(recipe=recipe, ingredient=ingredient,
+                              amount=self.random.randint(1, 500))
+            for recipe in self.recipes
+            for ingredient in self.sample(self.ingredients,
+                                          options['ingredients_per_recipe'])
+        )
+        Tags = Recipe.tags.through
+        Tags.objects.bulk_create(
+            Tags(recipe=recipe, tag=self.random.choice(self.tags))
+            for recipe in self.recipes
+        )
+        for field, count in (('favorites', 'favorites_per_user'),
+                             ('shopping_list', 'cart_per_user')):
+            through = getattr(User, field).through
+            through.objects.bulk_create(
+                through(user=user, recipe=recipe)
+                for user in self.users
+                for recipe in self.sample(self.recipes, options[count])
+            )
+        Subscriptions = User.subscriptions.through
+        Subscriptions.objects.bulk_create(
+            Subscriptions(from_user=user, to_user=author)
+            for user in self.users
+            for author in self.sample(
+                [other for other in self.users if other != user],
+                options['subscriptions_per_user']
+            )
+        )
+        call_command('rebuild_counters', stdout=io.StringIO())
+        call_command('rebuild_feed', stdout=io.StringIO())
+        call_command('check_cart_totals', fix=True, stdout=io.StringIO())
+
+    def run_benchmarks(self):
+        user = self.users[0]
+        client = APIClient()
+        client.force_authenticate(user)
+        anonymous = APIClient()
+        recipe = self.recipes[0]
+        own_recipe = user.recipes.first()
+        image = make_image()
+        author = self.users[1]
+        last_page = max(1, len(self.recipes) // DEFAULT_PAGE_SIZE)
+        carts = {}
+        for name, cart_user, size in (('small', self.users[-1], SMALL_CART),
+                                      ('large', self.users[-2], LARGE_CART)):
+            cart_user.shopping_list.set(self.sample(self.recipes, size))
+            carts[name] = APIClient()
+            carts[name].force_authenticate(cart_user)
+
+        def recipe_payload():
+            return {
+                'ingredients': [
+                    {'id': ingredient.id,
+                     'amount': self.random.randint(1, 500)}
+                    for ingredient in self.sample(
+                        self.ingredients,
+                        self.options['ingredients_per_recipe']
+                    )
+                ],
+                'tags': [self.random.choice(self.tags).id],
+                'name': 'Benchmark',
+                'image': image,
+                'text': 'Описание',
+                'cooking_time': 15,
+            }
+
+        def update_payload():
+            payload = recipe_payload()
+            del payload['image']
+            return payload
+
+        scenarios = {
+            'recipe_list_anonymous': (anonymous, 'get',
+                                      '/api/recipes/', None),
+            'recipe_list': (client, 'get', '/api/recipes/', None),
+            'recipe_list_favorited': (client, 'get',
+                                      '/api/recipes/?is_favorited=1', None),
+            'recipe_list_filters': (
+                client, 'get',
+                f'/api/recipes/?is_in_shopping_cart=0&tags={TAG_SLUGS[0]}'
+                f'&tags={TAG_SLUGS[1]}&author={author.id}', None
+            ),
+            'recipe_list_deep_page': (client, 'get',
+                                      f'/api/recipes/?page={last_page}',
+                                      None),
+            'recipe_list_cursor': (client, 'get',
+                                   '/api/recipes/?cursor=', None),
+            'recipe_detail': (client, 'get',
+                              f'/api/recipes/{recipe.id}/', None),
+            'feed': (client, 'get', '/api/recipes/feed/', None),
+            'recipes_by_ingredients': (
+                anonymous, 'get',
+                lambda: '/api/recipes/by_ingredients/?' + '&'.join(
+                    f'ingredients={ingredient.id}'
+                    for ingredient in self.sample(self.ingredients, 10)
+                ),
+                None
+            ),
+            'subscriptions': (client, 'get',
+                              '/api/users/subscriptions/?recipes_limit=3',
+                              None),
+            'shopping_cart_preview': (client, 'get',
+                                      '/api/recipes/shopping_cart/', None),
+            'download_shopping_cart': (
+                client, 'get', '/api/recipes/download_shopping_cart/', None
+            ),
+            'download_shopping_cart_small': (
+                carts['small'], 'get',
+                '/api/recipes/download_shopping_cart/', None
+            ),
+            'download_shopping_cart_large': (
+                carts['large'], 'get',
+                '/api/recipes/download_shopping_cart/', None
+            ),
+            'ingredient_autocomplete': (
+                anonymous, 'get',
+                lambda: '/api/ingredients/?name='
+                        + self.random.choice(SEARCH_TERMS),
+                None
+            ),
+            'recipe_create': (client, 'post', '/api/recipes/',
+                              recipe_payload),
+            'recipe_update': (client, 'patch',
+                              f'/api/recipes/{own_recipe.id}/',
+                              update_payload),
+        }
+        scenarios.update((f'{name}_cold', scenarios[name] + (True,))
+                         for name in COLD_SCENARIOS)
+        results = {
+            name: self.measure(*scenario)
+            for name, scenario in scenarios.items()
+        }
+        results.update(
+            (name, self.measure_query(search))
+            for name, search in SEARCH_QUERIES.items()
+        )
+        return results
+
+    def measure_query(self, make_queryset):
+        durations = []
+        queries = []
+        for iteration in range(self.options['warmup']
+                               + self.options['iterations']):
+            queryset = make_queryset(self.random.choice(SEARCH_TERMS))
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                list(queryset.values_list('id', 'name', 'measurement_unit'))
+                elapsed = (time.perf_counter() - start) * 1000
+            if iteration >= self.options['warmup']:
+                durations.append(elapsed)
+                queries.append(len(context.captured_queries))
+        return summarize(durations, queries)
+
+    def measure(self, client, method, url, payload, cold=False):
+        durations = []
+        queries = []
+        for iteration in range(self.options['warmup']
+                               + self.options['iterations']):
+            path = url() if callable(url) else url
+            data = payload() if payload else None
+            if cold:
+                for cache in caches.all():
+                    cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data,
+                                                   format='json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f'{method.upper()} {path}: {response.status_code}'
+                )
+            if iteration >= self.options['warmup']:
+                durations.append(elapsed)
+                queries.append(len(context.captured_queries))
+        return summarize(durations, queries)
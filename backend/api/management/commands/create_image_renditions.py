@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from api.images import RENDITIONS, create_renditions, renditions_ready
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true')
+
+    def handle(self, *args, **options):
+        created = 0
+        images = (Recipe.objects
+                  .exclude(image='')
+                  .values_list('image', 'renditions')
+                  .iterator())
+        for name, renditions in images:
+            if not options['force'] and renditions == list(RENDITIONS):
+                continue
+            create_renditions(name)
+            renditions_ready(name)
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {created}'
+        ))
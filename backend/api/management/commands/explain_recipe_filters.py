@@ -0,0 +1,104 @@
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from api.filters import RecipeFilterSet
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+BOOLEAN_VALUES = (None, '1', '0')
+
+# Through tables probed by the EXISTS subquery of each filter.
+FILTER_TABLES = {
+    'is_favorited': User.favorites.through._meta.db_table,
+    'is_in_shopping_cart': User.shopping_list.through._meta.db_table,
+    'tags': Recipe.tags.through._meta.db_table,
+}
+
+
+def filter_combinations(slugs, author):
+    combinations = itertools.product(
+        BOOLEAN_VALUES,
+        BOOLEAN_VALUES,
+        (None, slugs[:1], slugs),
+        (None, author),
+        (None, 'popular'),
+    )
+    for favorited, in_cart, tags, author_id, ordering in combinations:
+        yield {key: value for key, value in (
+            ('is_favorited', favorited),
+            ('is_in_shopping_cart', in_cart),
+            ('tags', tags),
+            ('author', author_id),
+            ('ordering', ordering),
+        ) if value}
+
+
+def get_table_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {name for name, info in constraints.items()
+            if (info['index'] or info['unique']) and not info['primary_key']}
+
+
+def find_problems(sql, ids, data=None, plan=None):
+    problems = []
+    if ' JOIN ' in sql:
+        problems.append('JOIN')
+    if len(ids) != len(set(ids)):
+        problems.append('duplicates')
+    if plan is not None:
+        for name, table in FILTER_TABLES.items():
+            if name in data and not any(index in plan for index
+                                        in get_table_indexes(table)):
+                problems.append(f'{table}: no index')
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Строит SQL и планы выполнения для всех сочетаний фильтров '
+            'списка рецептов и проверяет, что в запросах нет JOIN и '
+            'повторяющихся рецептов, а с --explain еще и что подзапросы '
+            'к промежуточным таблицам идут по индексам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int)
+        parser.add_argument('--explain', action='store_true')
+
+    def handle(self, *args, **options):
+        user = (User.objects.get(pk=options['user']) if options['user']
+                else User.objects.order_by('pk').first())
+        if user is None:
+            raise CommandError('В базе нет пользователей.')
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        author = (Recipe.objects
+                  .values_list('author', flat=True)
+                  .order_by('author')
+                  .first())
+        failures = []
+        for data in filter_combinations(slugs, author):
+            filterset = RecipeFilterSet(data, queryset=Recipe.objects.all(),
+                                        request=request)
+            if not filterset.is_valid():
+                raise CommandError(f'{data}: {dict(filterset.errors)}')
+            queryset = filterset.qs
+            sql = str(queryset.query)
+            ids = list(queryset.values_list('pk', flat=True))
+            plan = queryset.explain() if options['explain'] else None
+            problems = find_problems(sql, ids, data, plan)
+            status = ', '.join(problems) or 'ok'
+            self.stdout.write(f'{data}: {len(ids)} rows, {status}')
+            if options['verbosity'] > 1:
+                self.stdout.write(sql)
+            if plan is not None:
+                self.stdout.write(plan)
+            if problems:
+                failures.append(data)
+        if failures:
+            raise CommandError(f'Проблемные сочетания фильтров: {failures}')
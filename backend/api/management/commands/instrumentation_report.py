@@ -0,0 +1,13 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.instrumentation import build_report
+
+
+class Command(BaseCommand):
+    help = ('Выводит гистограммы количества запросов и времени ответа '
+            'по эндпоинтам за последнее окно наблюдения.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(build_report(), indent=2))
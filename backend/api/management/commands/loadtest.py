@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from .benchmark import get_commit, summarize_latency
+
+DEFAULT_PATHS = ('/api/recipes/', '/api/tags/', '/api/ingredients/')
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными соединениями и '
+            'измеряет пропускную способность эндпоинтов на чтение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url')
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--token')
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.paths = options['paths'] or DEFAULT_PATHS
+        self.deadline = time.perf_counter() + options['duration']
+        self.lock = threading.Lock()
+        self.durations = []
+        self.errors = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for worker in range(options['concurrency']):
+                executor.submit(self.work, worker)
+        elapsed = time.perf_counter() - started
+        report = {
+            'commit': get_commit(),
+            'base_url': options['base_url'],
+            'paths': list(self.paths),
+            'concurrency': options['concurrency'],
+            'duration_s': round(elapsed, 2),
+            'requests_per_second': round(len(self.durations) / elapsed, 1),
+            'errors': self.errors,
+        }
+        if self.durations:
+            report.update(summarize_latency(self.durations))
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def work(self, worker):
+        session = requests.Session()
+        if self.options['token']:
+            session.headers['Authorization'] = (
+                f'Token {self.options["token"]}'
+            )
+        durations = []
+        errors = 0
+        index = worker
+        while time.perf_counter() < self.deadline:
+            url = self.options['base_url'].rstrip('/') + (
+                self.paths[index % len(self.paths)]
+            )
+            index += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(url, allow_redirects=False)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            if failed:
+                errors += 1
+            else:
+                durations.append((time.perf_counter() - start) * 1000)
+        with self.lock:
+            self.durations.extend(durations)
+            self.errors += errors
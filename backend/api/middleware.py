@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+from .db import route_reads
+from .instrumentation import (SETTINGS,
+                              collect_metrics,
+                              instrument_connection,
+                              instrument_connections,
+                              instrument_serializers,
+                              record)
+
+logger = logging.getLogger(__name__)
+
+
+@sync_and_async_middleware
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        if not SETTINGS.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.query_budgets = SETTINGS.get('QUERY_BUDGETS', {})
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function, the way
+            # MiddlewareMixin does it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        instrument_serializers()
+        # Sync views under ASGI run in threads this middleware never
+        # sees, their connections are instrumented when they connect.
+        instrument_connections()
+        connection_created.connect(instrument_connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        return self.process(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect_metrics() as metrics:
+            response = await self.get_response(request)
+        # Recording talks to the cache, which must not block the loop.
+        return await sync_to_async(self.process, thread_sensitive=False)(
+            request, response, metrics, start
+        )
+
+    def process(self, request, response, metrics, start):
+        total = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        if match is None:
+            return response
+        endpoint = f'{request.method} {match.view_name}'
+        response['Server-Timing'] = ', '.join((
+            f'db;desc="{metrics.queries} queries";dur={metrics.db:.1f}',
+            f'serializer;dur={metrics.serializer:.1f}',
+            f'total;dur={total:.1f}',
+        ))
+        budget = self.query_budgets.get(endpoint)
+        if budget is not None and metrics.queries > budget:
+            logger.warning('%s %s: выполнено запросов %s, допустимо %s',
+                           request.method, request.path,
+                           metrics.queries, budget)
+        record(endpoint, {
+            'queries': metrics.queries,
+            'db': metrics.db,
+            'serializer': metrics.serializer,
+            'total': total,
+        })
+        return response
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    # Both flavours are needed, a sync-only middleware would move every
+    # ASGI request back to the thread shared by sync code.
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with route_reads(request):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with route_reads(request):
+                return get_response(request)
+    return middleware
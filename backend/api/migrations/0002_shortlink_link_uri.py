@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shortlink',
+            name='link_uri',
+            field=models.CharField(db_index=True, max_length=36, unique=True),
+        ),
+    ]
@@ -1,12 +1,20 @@
+import string
 import sys
 import uuid
+import zlib
 
 from django.db import models
 
 from recipes.models import Recipe
 
+LINK_ALPHABET = string.digits + string.ascii_letters
+# Legacy codes are lowercase hex, so an uppercase checksum letter keeps
+# generated codes out of their namespace.
+CHECKSUM_ALPHABET = string.ascii_uppercase
+
 
 def link_uri_default():
+    # Kept for the initial migration, new links use link_uri_for().
     id = uuid.uuid4()
     n = 3
     LinkModel = getattr(sys.modules[__name__], 'ShortLink')
@@ -17,6 +25,36 @@ def link_uri_default():
     return str(id).replace('-', '')[:n]
 
 
+def link_uri_for(recipe_id):
+    digits = []
+    while True:
+        recipe_id, remainder = divmod(recipe_id, len(LINK_ALPHABET))
+        digits.append(LINK_ALPHABET[remainder])
+        if not recipe_id:
+            break
+    code = ''.join(reversed(digits))
+    checksum = zlib.crc32(code.encode()) % len(CHECKSUM_ALPHABET)
+    return code + CHECKSUM_ALPHABET[checksum]
+
+
+def decode_link_code(code):
+    recipe_id = 0
+    for char in code:
+        recipe_id = recipe_id * len(LINK_ALPHABET) + LINK_ALPHABET.index(char)
+    return recipe_id
+
+
+def link_uri_valid(slug):
+    # Rejects mistyped and guessed codes without a database lookup.
+    if not slug:
+        return False
+    code, checksum = slug[:-1], slug[-1]
+    if checksum not in CHECKSUM_ALPHABET:
+        return all(char in string.hexdigits.lower() for char in slug)
+    return (bool(code) and all(char in LINK_ALPHABET for char in code)
+            and link_uri_for(decode_link_code(code)) == slug)
+
+
 class ShortLink(models.Model):
 
     recipe = models.OneToOneField(
@@ -28,6 +66,10 @@ class ShortLink(models.Model):
     link_uri = models.CharField(
         max_length=36,
         unique=True,
-        db_index=True,
-        default=link_uri_default
+        db_index=True
     )
+
+    def save(self, *args, **kwargs):
+        if not self.link_uri:
+            self.link_uri = link_uri_for(self.recipe_id)
+        super().save(*args, **kwargs)
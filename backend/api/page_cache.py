@@ -0,0 +1,128 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+
+from recipes.models import Recipe
+from recipes.versions import get_versions, user_version_name
+
+User = get_user_model()
+
+SETTINGS = settings.FOODGRAM.get('PAGE_CACHE', {})
+KEY_PREFIX = 'foodgram:page'
+SHARED_VERSIONS = ('recipes', 'tags', 'ingredients', 'users')
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_cache():
+    return caches[SETTINGS.get('CACHE', 'default')]
+
+
+def get_results(data):
+    return data['results'] if isinstance(data, dict) else data
+
+
+def flags_from_results(results):
+    return {
+        'favorited': [item['id'] for item in results
+                      if item['is_favorited']],
+        'in_cart': [item['id'] for item in results
+                    if item['is_in_shopping_cart']],
+        'subscribed': list({item['author']['id'] for item in results
+                            if item['author']['is_subscribed']}),
+    }
+
+
+def flags_from_db(user, results):
+    # The flags are cached under the current user version, so they are
+    # read from the primary.
+    database = router.db_for_write(Recipe)
+    recipe_flags = (Recipe.objects.using(database)
+                    .filter(pk__in=[item['id'] for item in results])
+                    .with_user_flags(user)
+                    .values_list('pk', 'is_favorited', 'is_in_shopping_cart'))
+    subscribed = (User.objects
+                  .with_subscription_flag(user)
+                  .using(database)
+                  .filter(pk__in={item['author']['id'] for item in results},
+                          is_subscribed=True)
+                  .values_list('pk', flat=True))
+    recipe_flags = list(recipe_flags)
+    return {
+        'favorited': [pk for pk, favorited, _ in recipe_flags if favorited],
+        'in_cart': [pk for pk, _, in_cart in recipe_flags if in_cart],
+        'subscribed': list(subscribed),
+    }
+
+
+def apply_flags(results, flags):
+    favorited = set(flags['favorited'])
+    in_cart = set(flags['in_cart'])
+    subscribed = set(flags['subscribed'])
+    for item in results:
+        item['is_favorited'] = item['id'] in favorited
+        item['is_in_shopping_cart'] = item['id'] in in_cart
+        item['author']['is_subscribed'] = item['author']['id'] in subscribed
+
+
+class RecipePageCache:
+    """Кэш страниц списка рецептов.
+
+    Общий слой хранит сериализованную страницу для всех пользователей,
+    персональный слой — только флаги избранного, корзины и подписок.
+    Ключи включают версии данных, поэтому сигналы, меняющие версии,
+    делают устаревшие записи недостижимыми.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+        self.enabled = not any(name in request.query_params
+                               for name in USER_FILTERS)
+        if not self.enabled:
+            return
+        shared_names = SHARED_VERSIONS
+        if request.query_params.get('ordering') == 'popular':
+            shared_names += ('favorites',)
+        user_names = ()
+        if self.user.is_authenticated:
+            user_names = (user_version_name(self.user.pk),)
+        versions = get_versions(*shared_names, *user_names)
+        digest = hashlib.md5('|'.join(
+            (request.build_absolute_uri(),
+             *(str(version) for version in versions[:len(shared_names)]))
+        ).encode()).hexdigest()
+        self.shared_key = f'{KEY_PREFIX}:{digest}'
+        self.user_key = None
+        if user_names:
+            self.user_key = (f'{self.shared_key}:user:{self.user.pk}:'
+                             f'{versions[-1]}')
+
+    def get(self):
+        if not self.enabled:
+            return None
+        cache = get_cache()
+        data = cache.get(self.shared_key)
+        if data is None:
+            return None
+        results = get_results(data)
+        flags = {'favorited': (), 'in_cart': (), 'subscribed': ()}
+        if self.user_key:
+            flags = cache.get(self.user_key)
+            if flags is None:
+                flags = flags_from_db(self.user, results)
+                cache.set(self.user_key, flags, SETTINGS.get('TIMEOUT'))
+        apply_flags(results, flags)
+        return data
+
+    def set(self, data):
+        if not self.enabled:
+            return
+        cache = get_cache()
+        timeout = SETTINGS.get('TIMEOUT')
+        cache.set(self.shared_key, data, timeout)
+        if self.user_key:
+            cache.set(self.user_key, flags_from_results(get_results(data)),
+                      timeout)
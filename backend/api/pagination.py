@@ -1,5 +1,17 @@
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.feed import FeedTimeline
 
 DEFAULT_PAGE_SIZE = settings.FOODGRAM['DEFAULT_PAGE_SIZE']
 
@@ -7,3 +19,124 @@ DEFAULT_PAGE_SIZE = settings.FOODGRAM['DEFAULT_PAGE_SIZE']
 class FoodgramPagination(PageNumberPagination):
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class RecipePagination(FoodgramPagination):
+    cursor_query_param = 'cursor'
+    # Keyset orderings, all descending; the last one is the default.
+    # A cursor holds the values of every field of its ordering.
+    cursor_orderings = (
+        ('-favorites_count', '-pub_date', '-id'),
+        ('-pub_date', '-id'),
+    )
+    cursor_fields = {
+        'favorites_count': int,
+        'pub_date': parse_datetime,
+        'id': int,
+    }
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = self.get_cursor_ordering(queryset)
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        results = list(self.seek(queryset, position)[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = self.get_position(results[-1])
+        return results
+
+    def get_cursor_ordering(self, queryset):
+        # The ordering filter sets every field but the tie-breaker.
+        for ordering in self.cursor_orderings:
+            if tuple(queryset.query.order_by) == ordering[:-1]:
+                return ordering
+        return self.cursor_orderings[-1]
+
+    def seek(self, queryset, position):
+        queryset = queryset.order_by(*self.ordering)
+        if position is None:
+            return queryset
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.get_field_names(), position):
+            condition |= Q(**equal, **{f'{field}__lt': value})
+            equal[field] = value
+        return queryset.filter(condition)
+
+    def get_field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_position(self, item):
+        return tuple(getattr(item, field)
+                     for field in self.get_field_names())
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        fields = self.get_field_names()
+        try:
+            decoded = base64.urlsafe_b64decode(cursor.encode()).decode()
+            values = decoded.split('|')
+            if len(values) != len(fields):
+                raise ValueError
+            position = tuple(self.cursor_fields[field](value)
+                             for field, value in zip(fields, values))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode('|'.join(
+            value.isoformat() if isinstance(value, datetime) else str(value)
+            for value in position
+        ).encode()).decode()
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class FeedPagination(RecipePagination):
+    """Пагинация ленты: без фильтров лента читается через FeedTimeline.
+
+    Страницы FeedTimeline состоят из пар (pub_date, id рецепта).
+    """
+
+    def get_cursor_ordering(self, queryset):
+        if isinstance(queryset, FeedTimeline):
+            return self.cursor_orderings[-1]
+        return super().get_cursor_ordering(queryset)
+
+    def seek(self, queryset, position):
+        if isinstance(queryset, FeedTimeline):
+            return queryset.seek(position)
+        return super().seek(queryset, position)
+
+    def get_position(self, item):
+        if isinstance(item, tuple):
+            return item
+        return super().get_position(item)
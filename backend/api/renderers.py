@@ -0,0 +1,128 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.http import Http404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+
+CSV_HEADER = ('Ингредиент', 'Единицы измерения', 'Количество')
+
+PDF_FONT_NAME = 'FoodgramSans'
+PDF_DEFAULT_FONT_NAME = 'Helvetica'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # The list itself is streamed by the view, DRF only renders
+        # error responses (e.g. 401) through the accepted renderer.
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}'
+                             for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield f'{SHOPPING_LIST_TITLE} \n'
+        for row in rows:
+            yield f'{row.name}, {row.measurement_unit} - {row.total_amount}\n'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(CSV_HEADER)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def get_font_name(self):
+        font_path = settings.FOODGRAM.get('PDF_FONT')
+        if not font_path or not os.path.exists(font_path):
+            return PDF_DEFAULT_FONT_NAME
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+
+    def stream(self, rows):
+        buffer = io.BytesIO()
+        font_name = self.get_font_name()
+        height = A4[1]
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        lines_per_page = int((height - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT)
+        page_lines = [SHOPPING_LIST_TITLE]
+        for row in rows:
+            if len(page_lines) == lines_per_page:
+                self.draw_page(pdf, font_name, height, page_lines)
+                page_lines = []
+            page_lines.append(
+                f'{row.name}, {row.measurement_unit} - {row.total_amount}'
+            )
+        self.draw_page(pdf, font_name, height, page_lines)
+        pdf.save()
+        yield buffer.getvalue()
+
+    def draw_page(self, pdf, font_name, height, lines):
+        text = pdf.beginText(PDF_MARGIN, height - PDF_MARGIN)
+        text.setFont(font_name, PDF_FONT_SIZE)
+        text.setLeading(PDF_LINE_HEIGHT)
+        for line in lines:
+            text.textLine(line)
+        pdf.drawText(text)
+        pdf.showPage()
+
+
+SHOPPING_LIST_RENDERERS = (ShoppingListTextRenderer,
+                           ShoppingListCSVRenderer,
+                           ShoppingListPDFRenderer)
+
+
+class FormatNegotiation(BaseContentNegotiation):
+    # A download link is opened with whatever Accept header the client
+    # sends, so only ?format= picks the renderer, the first one being
+    # the default.
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format = format_suffix or request.query_params.get(
+            api_settings.URL_FORMAT_OVERRIDE
+        )
+        if not format:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == format:
+                return renderer, renderer.media_type
+        raise Http404
@@ -0,0 +1,52 @@
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+
+WORD_REGEX = re.compile(r'\w+')
+
+
+def trigrams(value):
+    result = set()
+    for word in WORD_REGEX.findall(value.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left, right):
+    # Python port of pg_trgm similarity(), registered in SQLite
+    # so that the same query runs on both backends.
+    if left is None or right is None:
+        return None
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def register_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('SIMILARITY', 2, similarity,
+                                              deterministic=True)
+
+
+def search_ingredients(queryset, value):
+    queryset = queryset.annotate(
+        prefix_rank=Case(
+            When(name__istartswith=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        ),
+        similarity=TrigramSimilarity('name', value)
+    )
+    if connections[queryset.db].vendor == 'postgresql':
+        similar = Q(name__trigram_similar=value)
+    else:
+        similar = Q(similarity__gte=TRIGRAM_SIMILARITY_THRESHOLD)
+    return (queryset
+            .filter(Q(name__icontains=value) | similar)
+            .order_by('prefix_rank', '-similarity', 'name'))
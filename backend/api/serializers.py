@@ -1,10 +1,17 @@
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
-from recipes.models import Ingredient, Recipe, Recipe_Ingredient, Tag
-from .fields import Base64ImageField
+from recipes.cart import update_carts
+from recipes.models import (CartTotal, Ingredient, Recipe, Recipe_Ingredient,
+                            Tag)
+from recipes.pantry import recipe_ingredients_changed
+from .fields import (Base64ImageField,
+                     ImageRenditionsField,
+                     ReferencePrimaryKeyRelatedField)
+from .images import schedule_image_delete, schedule_renditions
+from .utils import get_recipes_limit
 
 User = get_user_model()
 
@@ -32,9 +39,12 @@ class FoodgramUserDetailSerializer(UserSerializer):
                   'last_name', 'is_subscribed', 'avatar')
 
     def get_is_subscribed(self, obj):
-        if not self.context['request'].user.is_authenticated:
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        user = self.context['request'].user
+        if not user.is_authenticated:
             return False
-        return obj in self.context['request'].user.subscriptions.all()
+        return user.subscriptions.filter(pk=obj.pk).exists()
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -68,36 +78,35 @@ class RecipeIngredientReadOnlySerializer(serializers.ModelSerializer):
 class RecipeReadOnlySerializer(serializers.ModelSerializer):
     author = FoodgramUserDetailSerializer(read_only=True)
     image = serializers.ImageField(read_only=True)
+    image_renditions = ImageRenditionsField()
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    ingredients = RecipeIngredientReadOnlySerializer(
+        source='recipe_ingredient_set',
+        many=True,
+        read_only=True
+    )
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'ingredients',
-                  'name', 'image', 'text',
+                  'name', 'image', 'image_renditions', 'text',
                   'cooking_time', 'tags',
                   'is_favorited', 'is_in_shopping_cart')
 
-    def get_is_favorited(self, obj):
-        return self.context['request'].user in obj.is_favorited_by.all()
 
-    def get_is_in_shopping_cart(self, obj):
-        return self.context['request'].user in obj.in_shopping_list_of.all()
+class RecipeByIngredientsSerializer(RecipeReadOnlySerializer):
+    missing_ingredients = serializers.IntegerField(read_only=True)
 
-    def get_ingredients(self, obj):
-        qset = Recipe_Ingredient.objects.filter(
-            recipe=obj
+    class Meta(RecipeReadOnlySerializer.Meta):
+        fields = RecipeReadOnlySerializer.Meta.fields + (
+            'missing_ingredients',
         )
-        return [
-            RecipeIngredientReadOnlySerializer(instance=record).data
-            for record in qset
-        ]
 
 
 class RecipeIngredientWhriteOnlySerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = ReferencePrimaryKeyRelatedField(
         queryset=Ingredient.objects.all()
     )
 
@@ -120,7 +129,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         read_only=False,
         many=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = ReferencePrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         read_only=False
@@ -169,31 +178,77 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         return super().validate(attrs)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        for ingredient_obj, amount in ingredients.items():
-            Recipe_Ingredient.objects.create(recipe=recipe,
-                                             ingredient=ingredient_obj,
-                                             amount=amount)
+        Recipe_Ingredient.objects.bulk_create(
+            Recipe_Ingredient(recipe=recipe,
+                              ingredient=ingredient_obj,
+                              amount=amount)
+            for ingredient_obj, amount in ingredients.items()
+        )
+        recipe_ingredients_changed(
+            recipe.pk, (),
+            [ingredient_obj.pk for ingredient_obj in ingredients],
+            len(ingredients)
+        )
+        schedule_renditions(recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        old_image = instance.image.name
         if 'image' in validated_data:
-            instance.image.delete(save=True)
+            instance.renditions = []
         super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_image_delete(old_image)
+            schedule_renditions(instance.image.name)
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        for ingredient_obj, amount in ingredients.items():
-            Recipe_Ingredient.objects.create(recipe=instance,
-                                             ingredient=ingredient_obj,
-                                             amount=amount)
+        self.update_ingredients(instance, ingredients)
         return instance
 
+    def update_ingredients(self, recipe, ingredients):
+        amounts = {ingredient_obj.pk: amount
+                   for ingredient_obj, amount in ingredients.items()}
+        to_delete = []
+        to_update = []
+        removed = []
+        cart_changes = {}
+        for record in recipe.recipe_ingredient_set.all():
+            amount = amounts.pop(record.ingredient_id, None)
+            if amount is None:
+                to_delete.append(record.pk)
+                removed.append(record.ingredient_id)
+                cart_changes[record.ingredient_id] = (-record.amount, -1)
+            elif amount != record.amount:
+                cart_changes[record.ingredient_id] = (amount - record.amount,
+                                                      0)
+                record.amount = amount
+                to_update.append(record)
+        if to_delete:
+            Recipe_Ingredient.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            Recipe_Ingredient.objects.bulk_update(to_update, ['amount'])
+        Recipe_Ingredient.objects.bulk_create(
+            Recipe_Ingredient(recipe=recipe,
+                              ingredient_id=ingredient_id,
+                              amount=amount)
+            for ingredient_id, amount in amounts.items()
+        )
+        if removed or amounts:
+            recipe_ingredients_changed(recipe.pk, removed, amounts,
+                                       len(ingredients))
+        cart_changes.update((ingredient_id, (amount, 1))
+                            for ingredient_id, amount in amounts.items())
+        if cart_changes:
+            update_carts(recipe.pk, cart_changes)
+
 
 class RecipeUpdateSerializer(RecipeCreateSerializer):
     image = Base64ImageField(image_type='recipe', required=False)
@@ -202,11 +257,25 @@ class RecipeUpdateSerializer(RecipeCreateSerializer):
         pass
 
 
+class CartTotalSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = CartTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount',
+                  'recipes_count')
+
+
 class RecipeFavoriteSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
@@ -220,23 +289,18 @@ class SubscriptionSerializer(FoodgramUserDetailSerializer):
                   'recipes', 'recipes_count')
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        qset = obj.recipes.all()
-        page_size = self.context['request'].query_params.get(
-            'recipes_limit',
-            None
-        )
-        paginated_qset = None
-        if page_size:
-            try:
-                paginator = Paginator(qset, page_size)
-                paginated_qset = paginator.get_page(1)
-            except Exception:
-                paginated_qset = None
+        if hasattr(obj, 'recipe_previews'):
+            qset = obj.recipe_previews
+        else:
+            qset = obj.recipes.all()
+            limit = get_recipes_limit(self.context['request'])
+            if limit:
+                qset = qset[:limit]
         serializer = RecipeFavoriteSerializer(
-            paginated_qset or qset,
+            qset,
             many=True
         )
         return serializer.data
@@ -0,0 +1,24 @@
+import pytest
+
+from api.instrumentation import QueryBudgetExceeded
+from api.tests import (create_recipes, make_client, make_ingredients,
+                       make_tags, make_user)
+
+
+@pytest.fixture
+def recipe(db):
+    return create_recipes(make_user('author'), make_tags('breakfast'),
+                          make_ingredients(10), 1)[0]
+
+
+def test_recipe_detail_within_budget(recipe, query_budget):
+    with query_budget('GET recipe-detail') as metrics:
+        response = make_client().get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 200
+    assert metrics.queries > 0
+
+
+def test_query_budget_exceeded(recipe, query_budget):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(0):
+            make_client().get(f'/api/recipes/{recipe.pk}/')
@@ -0,0 +1,652 @@
+import asyncio
+import base64
+import io
+import re
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from api.async_views import ASYNC_READ_VIEWS
+from api.db import REPLICA
+from api.filters import RecipeFilterSet
+from api.images import RENDITIONS, create_renditions, renditions_ready
+from api.instrumentation import SETTINGS, build_report, query_budget, record
+from api.management.commands.explain_recipe_filters import (
+    FILTER_TABLES, filter_combinations, find_problems, get_table_indexes)
+from api.models import CHECKSUM_ALPHABET, ShortLink, link_uri_for
+from backend.asgi import FoodgramASGIHandler, application
+from recipes.management.commands import load_ingredients
+from recipes.models import (FeedEntry, Ingredient, Recipe, Recipe_Ingredient,
+                            Tag)
+from recipes.pantry import PantryIndex, catch_up, get_sequence
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+       'AAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg==')
+
+
+def make_user(username, **fields):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия', password='password',
+        **fields
+    )
+
+
+def make_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def make_tags(*slugs):
+    return [Tag.objects.create(name=slug, slug=slug) for slug in slugs]
+
+
+def make_ingredients(count):
+    return [Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(count)]
+
+
+def create_recipes(author, tags, ingredients, count):
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {i}', text='Описание',
+               cooking_time=10, image='recipes/images/test.jpg')
+        for i in range(count)
+    )
+    recipes = list(Recipe.objects.filter(author=author))
+    Recipe_Ingredient.objects.bulk_create(
+        Recipe_Ingredient(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    Tags = Recipe.tags.through
+    Tags.objects.bulk_create(
+        Tags(recipe=recipe, tag=tag) for recipe in recipes for tag in tags
+    )
+    return recipes
+
+
+class FoodgramTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+
+class RecipeListQueriesTest(FoodgramTestCase):
+    # author filter lookup, count, recipes, authors, ingredients and
+    # tags; the flags are annotated on the recipes query.
+    LIST_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.tags = make_tags('breakfast', 'lunch')
+        cls.ingredients = make_ingredients(30)
+
+    def test_page_queries_do_not_depend_on_ingredient_count(self):
+        for ingredients_count in (1, 30):
+            author = make_user(f'author{ingredients_count}')
+            create_recipes(author, self.tags,
+                           self.ingredients[:ingredients_count], PAGE_SIZE)
+            for name, client in (('anonymous', make_client()),
+                                 ('authenticated', make_client(self.user))):
+                cache.clear()
+                with self.subTest(ingredients=ingredients_count,
+                                  client=name):
+                    with self.assertNumQueries(self.LIST_QUERIES):
+                        response = client.get(
+                            f'/api/recipes/?author={author.pk}'
+                            f'&limit={PAGE_SIZE}'
+                        )
+                    results = response.data['results']
+                    self.assertEqual(len(results), PAGE_SIZE)
+                    self.assertEqual(
+                        {len(recipe['ingredients']) for recipe in results},
+                        {ingredients_count}
+                    )
+
+
+class RecipeDetailTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.recipe = create_recipes(cls.author, make_tags('breakfast'),
+                                    make_ingredients(10), 1)[0]
+        cls.url = f'/api/recipes/{cls.recipe.pk}/'
+
+    @override_settings(CACHE_SHARED=True)
+    def test_not_modified(self):
+        client = make_client()
+        etag = client.get(self.url)['ETag']
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.recipe.name = 'Новое название'
+        self.recipe.save()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_renditions_ready(self):
+        name = default_storage.save(
+            'recipes/images/new.png',
+            ContentFile(base64.b64decode(PNG.split(',')[1]))
+        )
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        client = make_client()
+        response = client.get(self.url)
+        self.assertIsNone(response.data['image_renditions'])
+        create_renditions(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            renditions_ready(name)
+        # Readiness is read from the recipe, not from the storage.
+        with mock.patch.object(default_storage, 'exists',
+                               side_effect=AssertionError):
+            response = client.get(self.url,
+                                  HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['image_renditions']),
+                         list(RENDITIONS))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_no_etag_without_shared_cache(self):
+        response = make_client().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_invalid_pk(self):
+        for shared in (True, False):
+            with self.subTest(shared=shared), \
+                    override_settings(CACHE_SHARED=shared):
+                response = make_client().get('/api/recipes/abc/')
+                self.assertEqual(response.status_code, 404)
+
+    def test_replaced_image_deleted_after_commit(self):
+        old_image = 'recipes/images/old.png'
+        default_storage.save(old_image, ContentFile(b'old'))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=old_image)
+        payload = {
+            'image': PNG,
+            'tags': list(self.recipe.tags.values_list('pk', flat=True)),
+            'ingredients': [{'id': self.recipe.recipe_ingredient_set.first()
+                             .ingredient_id, 'amount': 5}],
+        }
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = make_client(self.author).patch(self.url, payload,
+                                                      format='json')
+        self.assertEqual(response.status_code, 200)
+        # Nothing is removed until the transaction commits.
+        self.assertTrue(default_storage.exists(old_image))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(default_storage.exists(old_image))
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, old_image)
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+
+    def test_link_redirect_checks_checksum(self):
+        slug = link_uri_for(self.recipe.pk)
+        ShortLink.objects.create(recipe=self.recipe, link_uri=slug)
+        legacy = ShortLink.objects.create(
+            recipe=create_recipes(make_user('legacy'), (), (), 1)[0],
+            link_uri='a1f'
+        )
+        client = make_client()
+        self.assertEqual(client.get(f'/s/{slug}/').status_code, 302)
+        self.assertEqual(client.get(f'/s/{legacy.link_uri}/').status_code,
+                         302)
+        wrong = CHECKSUM_ALPHABET[
+            (CHECKSUM_ALPHABET.index(slug[-1]) + 1) % len(CHECKSUM_ALPHABET)
+        ]
+        for invalid in (slug[:-1] + wrong, '0' + slug, 'zzz', 'A'):
+            with self.subTest(slug=invalid), self.assertNumQueries(0):
+                response = client.get(f'/s/{invalid}/')
+                self.assertEqual(response.status_code, 404)
+
+
+class InstrumentationReportTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_report_reads_recorded_metrics(self):
+        for total in (3, 40, 40):
+            record('GET recipe-list', {'queries': 6, 'db': 2,
+                                       'serializer': 1, 'total': total})
+        report = build_report()
+        self.assertEqual(list(report), ['GET recipe-list'])
+        endpoint = report['GET recipe-list']
+        self.assertEqual(endpoint['total']['count'], 3)
+        self.assertEqual(endpoint['total']['p50'], 50)
+        self.assertEqual(endpoint['queries']['histogram']['10'], 3)
+
+
+class AsgiUrlsTest(SimpleTestCase):
+    PATHS = (
+        '/api/recipes/',
+        '/api/recipes/1/',
+        '/api/recipes/download_shopping_cart/',
+        '/api/recipes/shopping_cart/',
+        '/api/recipes/feed/',
+        '/api/recipes/by_ingredients/',
+        '/api/recipes/1/shopping_cart/',
+        '/api/tags/1/',
+        '/api/users/me/avatar/',
+        '/s/1A/',
+    )
+
+    def test_asgi_urls_match_wsgi_urls(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                wsgi = resolve(path, 'backend.urls')
+                asgi = resolve(path, 'backend.asgi_urls')
+                self.assertEqual(asgi.view_name, wsgi.view_name)
+                self.assertEqual(asgi.kwargs, wsgi.kwargs)
+                self.assertEqual(
+                    asyncio.iscoroutinefunction(asgi.func),
+                    asgi.url_name in ASYNC_READ_VIEWS + ('recipe-link',)
+                )
+
+
+def asgi_get(path, app=application):
+    async def get():
+        communicator = ApplicationCommunicator(app, {
+            'type': 'http', 'method': 'GET',
+            'headers': [(b'host', b'testserver')],
+            'path': path, 'query_string': b'',
+        })
+        await communicator.send_input({'type': 'http.request'})
+        response = await communicator.receive_output(timeout=5)
+        await communicator.wait(timeout=5)
+        return response
+
+    return async_to_sync(get)()
+
+
+class AsgiApplicationTest(TransactionTestCase):
+
+    def test_asgi_application_uses_asgi_urls(self):
+        response = asgi_get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response['status'], 401)
+
+    def test_server_timing_counts_offloaded_queries(self):
+        recipe = create_recipes(make_user('author'), make_tags('breakfast'),
+                                make_ingredients(2), 1)[0]
+        url = f'/api/recipes/{recipe.pk}/'
+        with mock.patch.dict(SETTINGS, ENABLED=True):
+            wsgi = make_client().get(url)['Server-Timing']
+            cache.clear()
+            response = asgi_get(url, FoodgramASGIHandler())
+        asgi = dict(response['headers'])[b'Server-Timing'].decode()
+        queries = [re.match(r'db;desc="(\d+) queries"', timing).group(1)
+                   for timing in (wsgi, asgi)]
+        self.assertNotEqual(queries[0], '0')
+        self.assertEqual(queries[1], queries[0])
+
+
+class ReplicaRoutingTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.recipe = create_recipes(cls.author, make_tags('breakfast'),
+                                    make_ingredients(2), 1)[0]
+
+    def setUp(self):
+        super().setUp()
+        # A second in-memory SQLite database with the same schema and no
+        # rows: anything read from it comes back empty, like a replica
+        # that has not caught up yet.
+        connections.databases[REPLICA] = {
+            **connections.databases['default'],
+            'NAME': 'file:foodgram_replica?mode=memory&cache=shared',
+            'TEST': {},
+        }
+        self.replica = connections[REPLICA]
+        models = [model for model in apps.get_models()
+                  if model._meta.managed and not model._meta.proxy]
+        with self.replica.schema_editor() as editor:
+            for model in models:
+                editor.create_model(model)
+        self.addCleanup(self.drop_replica, models)
+
+    def drop_replica(self, models):
+        # Closing does not drop an in-memory database, the tables do.
+        with self.replica.schema_editor() as editor:
+            for model in reversed(models):
+                editor.delete_model(model)
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    @override_settings(CACHE_SHARED=True)
+    def test_replica_routing(self):
+        client = make_client(self.author)
+        url = f'/api/recipes/?author={self.author.pk}'
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            # Pages that are going to be cached are read from the primary.
+            self.assertEqual(client.get(url).data['count'], 1)
+            self.assertEqual(client.get(url).data['count'], 1)
+        self.assertFalse(replica_queries)
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            # Other safe API requests read from the replica.
+            response = client.get('/api/recipes/?is_favorited=0')
+            self.assertEqual(response.data['count'], 0)
+        self.assertTrue(replica_queries)
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            # The detail state is read from the primary, the recipe
+            # itself from the replica, which does not have it yet.
+            response = client.get(f'/api/recipes/{self.recipe.pk}/')
+            self.assertEqual(response.status_code, 404)
+        self.assertTrue(replica_queries)
+        # Writes go to the primary.
+        response = client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(self.recipe.is_favorited_by.filter(
+            pk=self.author.pk).exists())
+
+    def test_no_replica_reads_outside_api(self):
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            make_client().get('/s/1A/')
+        self.assertFalse(replica_queries)
+
+
+class RecipeFiltersTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.tags = make_tags('breakfast', 'lunch')
+        authors = [make_user(f'author{i}') for i in range(2)]
+        ingredients = make_ingredients(1)
+        # Every recipe of the first author has both tags, so a filter
+        # over both tags that joins the tags table repeats them.
+        recipes = create_recipes(authors[0], cls.tags, ingredients, 3)
+        recipes += create_recipes(authors[1], cls.tags[:1], ingredients, 2)
+        cls.user.favorites.set(recipes[::2])
+        cls.user.shopping_list.set(recipes[:3])
+        cls.author = authors[0]
+
+    def test_filters_have_no_joins_or_duplicates(self):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = self.user
+        slugs = [tag.slug for tag in self.tags]
+        for data in filter_combinations(slugs, self.author.pk):
+            with self.subTest(**data):
+                filterset = RecipeFilterSet(
+                    data, queryset=Recipe.objects.all(), request=request
+                )
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                queryset = filterset.qs
+                ids = list(queryset.values_list('pk', flat=True))
+                self.assertEqual(find_problems(str(queryset.query), ids,
+                                               data, queryset.explain()),
+                                 [])
+        filterset = RecipeFilterSet({'tags': slugs},
+                                    queryset=Recipe.objects.all(),
+                                    request=request)
+        self.assertEqual(filterset.qs.count(), 5)
+
+    def test_through_table_indexes(self):
+        for table, index in (
+            (FILTER_TABLES['is_favorited'], 'users_favorites_recipe_user_idx'),
+            (FILTER_TABLES['is_in_shopping_cart'],
+             'users_shopping_recipe_user_idx'),
+            (FILTER_TABLES['tags'], 'recipes_tags_tag_recipe_idx'),
+        ):
+            with self.subTest(table=table):
+                self.assertIn(index, get_table_indexes(table))
+
+
+class FeedTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = make_user('reader')
+        authors = [make_user(f'author{i}') for i in range(4)]
+        tags = make_tags('breakfast')
+        ingredients = make_ingredients(1)
+        for author in authors:
+            for _ in range(4):
+                Recipe.objects.create(
+                    author=author, name='Рецепт', text='Описание',
+                    cooking_time=10, image='recipes/images/test.jpg'
+                )
+        Recipe.objects.update(pub_date=Recipe.objects.first().pub_date)
+        for recipe in Recipe.objects.all():
+            recipe.tags.set(tags)
+            Recipe_Ingredient.objects.create(
+                recipe=recipe, ingredient=ingredients[0], amount=1
+            )
+        cls.reader.subscriptions.set(authors[:3])
+        # The second author switched to fan-out-on-read after their
+        # recipes had been copied to the feed.
+        User.objects.filter(pk=authors[1].pk).update(feed_on_read=True)
+        FeedEntry.objects.update(pub_date=Recipe.objects.first().pub_date)
+        cls.expected = list(
+            Recipe.objects.feed_of(cls.reader)
+            .order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = make_client(self.reader)
+
+    def test_pages(self):
+        self.assertEqual(len(self.expected), 12)
+        ids = []
+        for page in (1, 2, 3):
+            with query_budget(9):
+                response = self.client.get(
+                    f'/api/recipes/feed/?limit=5&page={page}'
+                )
+            self.assertEqual(response.data['count'], 12)
+            ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, self.expected)
+
+    def test_cursor(self):
+        ids = []
+        url = '/api/recipes/feed/?limit=5&cursor='
+        while url:
+            response = self.client.get(url)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.expected)
+
+    def test_filters(self):
+        response = self.client.get('/api/recipes/feed/?tags=breakfast')
+        self.assertEqual(response.data['count'], 12)
+
+
+class RecipeCursorTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        recipes = create_recipes(make_user('author'), make_tags('breakfast'),
+                                 make_ingredients(1), 7)
+        # Ties on both the counter and the date leave the id to decide.
+        Recipe.objects.update(pub_date=recipes[0].pub_date)
+        for recipe, favorites_count in zip(recipes, (3, 0, 3, 1, 0, 3, 1)):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                favorites_count=favorites_count
+            )
+
+    def walk(self, query):
+        ids = []
+        url = f'/api/recipes/?limit=2&cursor=&{query}'
+        while url:
+            response = make_client().get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_cursor_keeps_ordering(self):
+        for query, ordering in (
+            ('', ('-pub_date', '-id')),
+            ('ordering=popular', ('-favorites_count', '-pub_date', '-id')),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.walk(query), list(
+                    Recipe.objects.order_by(*ordering)
+                    .values_list('pk', flat=True)
+                ))
+
+    def test_cursor_of_another_ordering(self):
+        next_url = make_client().get(
+            '/api/recipes/?limit=2&cursor='
+        ).data['next']
+        response = make_client().get(f'{next_url}&ordering=popular')
+        self.assertEqual(response.status_code, 404)
+
+
+class LoadIngredientsTest(FoodgramTestCase):
+
+    def load(self, content):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'ingredients.json'
+            path.write_text(content, encoding='utf-8')
+            # Small chunks split the objects between reads.
+            with mock.patch.object(load_ingredients,
+                                   'JSON_READ_CHUNK_SIZE', 7):
+                call_command('load_ingredients', path, stdout=io.StringIO())
+
+    def test_json(self):
+        self.load('[{"name": "соль", "measurement_unit": "г"},\n'
+                  ' {"name": "мука", "measurement_unit": "кг"}]\n')
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name', flat=True)),
+            ['мука', 'соль']
+        )
+
+    def test_broken_json(self):
+        item = '{"name": "соль", "measurement_unit": "г"}'
+        for content in (f'[{item}, {{"name": "му',
+                        f'[{item}, ',
+                        f'[{item}] {item}',
+                        f'[{item}, {{"name": "мука"}}]',
+                        f'[{item}, 1]'):
+            with self.subTest(content=content):
+                with self.assertRaises(CommandError):
+                    self.load(content)
+                self.assertFalse(Ingredient.objects.exists())
+
+
+class PantryIndexTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.tags = make_tags('breakfast')
+        cls.ingredients = make_ingredients(4)
+        cls.recipes = create_recipes(cls.author, cls.tags,
+                                     cls.ingredients[:2], 3)
+
+    def setUp(self):
+        super().setUp()
+        self.client = make_client(self.author)
+
+    def assert_ranked(self, index):
+        fresh = PantryIndex.from_db(index.sequence)
+        for ingredient_ids in ([self.ingredients[0].pk],
+                               [ingredient.pk
+                                for ingredient in self.ingredients]):
+            self.assertEqual(index.rank(ingredient_ids).tolist(),
+                             fresh.rank(ingredient_ids).tolist())
+
+    def test_max_missing_validated(self):
+        url = (f'/api/recipes/by_ingredients/'
+               f'?ingredients={self.ingredients[0].pk}&max_missing=')
+        for max_missing in ('²', '-1', '1.5', ''):
+            with self.subTest(max_missing=max_missing):
+                response = self.client.get(url + max_missing)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('max_missing', response.data)
+        self.assertEqual(self.client.get(url + '1').status_code, 200)
+
+    def test_second_worker_catches_up(self):
+        # Two workers hold their own copies of the index and share
+        # only the change log in the cache.
+        first = PantryIndex.from_db(get_sequence())
+        second = PantryIndex.from_db(get_sequence())
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'tags': [self.tags[0].pk],
+                 'ingredients': [{'id': ingredient.pk, 'amount': 1}
+                                 for ingredient in self.ingredients[1:]]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/recipes/{self.recipes[1].pk}/')
+        sequence = get_sequence()
+        self.assertEqual(sequence, second.sequence + 2)
+        for index in (first, second):
+            self.assertTrue(catch_up(index, sequence))
+            self.assertEqual(index.sequence, sequence)
+            self.assert_ranked(index)
+        missing = dict(second.rank([self.ingredients[0].pk]).tolist())
+        self.assertNotIn(recipe.pk, missing)
+        self.assertNotIn(self.recipes[1].pk, missing)
+
+
+class ShoppingListQueriesTest(FoodgramTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.recipes = create_recipes(cls.user, (), make_ingredients(10), 30)
+
+    def test_queries_do_not_depend_on_cart_size(self):
+        client = make_client(self.user)
+        for cart_size in (1, 30):
+            self.user.shopping_list.set(self.recipes[:cart_size])
+            with self.subTest(cart_size=cart_size):
+                with self.assertNumQueries(1):
+                    response = client.get(
+                        '/api/recipes/download_shopping_cart/?format=txt'
+                    )
+                    content = b''.join(response.streaming_content)
+                self.assertIn(f'{10 * cart_size}'.encode(), content)
+
+    def test_format_ignores_accept_header(self):
+        client = make_client(self.user)
+        self.user.shopping_list.set(self.recipes[:1])
+        for query, content_type in (('', 'text/plain'),
+                                    ('?format=csv', 'text/csv')):
+            with self.subTest(query=query):
+                response = client.get(
+                    f'/api/recipes/download_shopping_cart/{query}',
+                    HTTP_ACCEPT='application/json'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type)
+                )
+        response = client.get('/api/recipes/download_shopping_cart/'
+                              '?format=json')
+        self.assertEqual(response.status_code, 404)
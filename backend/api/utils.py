@@ -1,19 +1,23 @@
 import base64
+import binascii
 from pathlib import Path
 import re
+from tempfile import SpooledTemporaryFile
 
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.core.files import File
+from django.db.models import F
 from rest_framework import serializers
 
-from recipes.models import Recipe_Ingredient
+from recipes.models import CartTotal
 
 
 FORMAT_ERROR_MESSAGE = 'В поле изображения ожидается base64-строка'
 
-BASE64_IMAGE_REGEX = (r'^data:image/(?P<format>[a-z]+);'
-                      r'base64,(?P<image>[a-zA-Z0-9+/]+={,2})\Z')
+BASE64_HEADER_REGEX = r'^data:image/(?P<format>[a-z]+);base64\Z'
+
+BASE64_CHUNK_SIZE = 64 * 1024
 
 LOCATIONS = {
     'avatar': settings.FOODGRAM.get('AVATAR_STORAGE'),
@@ -24,39 +28,52 @@ LOCATIONS = {
 def get_image_from_base64(base64string, image_type):
     if not isinstance(base64string, str):
         raise serializers.ValidationError(FORMAT_ERROR_MESSAGE)
-    regex_match = re.fullmatch(BASE64_IMAGE_REGEX, base64string)
-    if not regex_match:
+    header, separator, imgstr = base64string.partition(',')
+    regex_match = re.fullmatch(BASE64_HEADER_REGEX, header)
+    if not separator or not regex_match or len(imgstr) % 4:
         raise serializers.ValidationError(FORMAT_ERROR_MESSAGE)
     format = regex_match.group('format')
-    imgstr = regex_match.group('image')
     file_path = Path(
         default_storage.get_available_name(
             f'{LOCATIONS[image_type]}/img.{format}'
         )
     )
-    file_obj = ContentFile(base64.b64decode(imgstr),
-                           name=file_path.name)
-    return file_obj
-
-
-def shopping_list_as_dict(qset):
-    ingr_amount = {}
-    for recipe in qset:
-        ingredients = recipe.ingredients.all()
-        for ingredient in ingredients:
-            amount = Recipe_Ingredient.objects.get(
-                recipe=recipe,
-                ingredient=ingredient
-            ).amount
-            if ingredient in ingr_amount:
-                ingr_amount[ingredient] += amount
-            else:
-                ingr_amount[ingredient] = amount
-    return ingr_amount
-
-
-def fill_cart_file(ingr_amount, response):
-    for ingredient, amount in ingr_amount.items():
-        response.write(
-            f'{ingredient.name}, {ingredient.measurement_unit} - {amount}\n'
-        )
+    decoded = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        for start in range(0, len(imgstr), BASE64_CHUNK_SIZE):
+            decoded.write(base64.b64decode(
+                imgstr[start:start + BASE64_CHUNK_SIZE],
+                validate=True
+            ))
+    except binascii.Error:
+        decoded.close()
+        raise serializers.ValidationError(FORMAT_ERROR_MESSAGE)
+    decoded.seek(0)
+    return File(decoded, name=file_path.name)
+
+
+def get_recipes_limit(request, param='recipes_limit'):
+    try:
+        limit = int(request.query_params.get(param))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def shopping_cart_totals(user):
+    return (CartTotal.objects
+            .filter(user=user, recipes_count__gt=0)
+            .order_by('ingredient__name'))
+
+
+def shopping_list_rows(user):
+    return (
+        shopping_cart_totals(user)
+        .annotate(name=F('ingredient__name'),
+                  measurement_unit=F('ingredient__measurement_unit'),
+                  total_amount=F('amount'))
+        .values_list('name', 'measurement_unit', 'total_amount',
+                     named=True)
+    )
@@ -1,6 +1,13 @@
+from contextlib import nullcontext
+
 from django.conf import settings
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.contrib.auth import get_user_model
+from django.db.models import (BooleanField, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
+from django.views.decorators.vary import vary_on_headers
 from djoser.views import UserViewSet
 from django_filters import rest_framework as filters
 from rest_framework import status, viewsets
@@ -10,29 +17,54 @@ from rest_framework.serializers import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.feed import FeedTimeline
+from recipes.models import Ingredient, Recipe, Recipe_Ingredient, Tag
+from recipes.pantry import rank_recipes
+from recipes.reference import get_reference_data
+from recipes.similar import similar_recipe_ids
+from .conditional import (conditional,
+                          ingredient_list_state,
+                          recipe_detail_state,
+                          recipe_list_state,
+                          tag_list_state)
+from .db import primary_reads
 from .decorators import m2m_set, m2m_unset
 from .filters import IngredientFilterSet, RecipeFilterSet
-from .models import ShortLink
-from .pagination import FoodgramPagination
+from .images import schedule_image_delete
+from .links import get_link_recipe_id, recipe_redirect_url
+from .models import ShortLink, link_uri_for
+from .page_cache import RecipePageCache
+from .pagination import (FeedPagination, FoodgramPagination,
+                         RecipePagination)
 from .permissions import AuthorOrStaffOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS, FormatNegotiation
 from .serializers import (AvatarSerializer,
+                          CartTotalSerializer,
                           FoodgramUserDetailSerializer,
                           IngredientSerializer,
+                          RecipeByIngredientsSerializer,
                           RecipeCreateSerializer,
                           RecipeFavoriteSerializer,
                           RecipeReadOnlySerializer,
                           RecipeUpdateSerializer,
                           SubscriptionSerializer,
                           TagSerializer)
-from .utils import (fill_cart_file,
-                    shopping_list_as_dict)
+from .utils import (get_recipes_limit, shopping_cart_totals,
+                    shopping_list_rows)
+
+User = get_user_model()
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    @conditional(tag_list_state)
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(get_reference_data(Tag).all(),
+                                         many=True)
+        return Response(serializer.data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -40,6 +72,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = IngredientFilterSet
 
+    @conditional(ingredient_list_state)
+    def list(self, request, *args, **kwargs):
+        if 'name' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            get_reference_data(Ingredient).all(),
+            many=True
+        )
+        return Response(serializer.data)
+
 
 class FoodgramUserDetailViewSet(UserViewSet):
     ALREADY_SUBSCRIBED_ERROR = 'Вы уже подписаны на данного пользователя.'
@@ -76,16 +118,26 @@ class FoodgramUserDetailViewSet(UserViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        qset = request.user.subscriptions.all()
+        qset = request.user.subscriptions.annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         page = self.paginate_queryset(qset)
-        if page is not None:
-            serializer = self.get_serializer(page,
-                                             many=True,
-                                             context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qset,
+        authors = list(qset) if page is None else page
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(request)
+        if limit:
+            recipes = (Recipe.objects
+                       .filter(author__in=authors)
+                       .latest_per_author(limit))
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='recipe_previews')
+        )
+        serializer = self.get_serializer(authors,
                                          many=True,
                                          context={'request': request})
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -110,12 +162,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
     DELETE_NONEXIST_FAVORITE = 'Указанного рецепта нет в избранном.'
     RECIPE_ALREADY_IN_SHOPPING_CART = 'Рецепт уже есть в корзине покупок.'
     DELETE_NONEXIST_SHOPPING_CART = 'Указанного рецепта нет в корзине покупок.'
+    INGREDIENTS_REQUIRED = 'Укажите id имеющихся ингредиентов в ingredients.'
+    INVALID_MAX_MISSING = 'max_missing должно быть неотрицательным числом.'
 
     queryset = Recipe.objects.select_related('author')
     http_method_names = ['get', 'post', 'patch', 'delete',
                          'head', 'options', 'trace']
     permission_classes = [AuthorOrStaffOrReadOnly]
-    pagination_class = FoodgramPagination
+    pagination_class = RecipePagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = RecipeFilterSet
 
@@ -124,14 +178,61 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeCreateSerializer
         if self.action in ('update', 'partial_update'):
             return RecipeUpdateSerializer
-        if self.action in ('favorite', 'shopping_cart'):
+        if self.action in ('favorite', 'shopping_cart', 'similar'):
             return RecipeFavoriteSerializer
+        if self.action == 'by_ingredients':
+            return RecipeByIngredientsSerializer
         return RecipeReadOnlySerializer
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return self.get_read_queryset()
+        return super().get_queryset()
+
+    def get_read_queryset(self):
+        user = self.request.user
+        return (
+            Recipe.objects
+            .prefetch_related(
+                Prefetch(
+                    'author',
+                    queryset=User.objects.with_subscription_flag(user)
+                ),
+                Prefetch(
+                    'recipe_ingredient_set',
+                    queryset=Recipe_Ingredient.objects.select_related(
+                        'ingredient'
+                    )
+                ),
+                'tags'
+            )
+            .with_user_flags(user)
+        )
+
+    @method_decorator(vary_on_headers('Authorization'))
+    @conditional(recipe_list_state)
+    def list(self, request, *args, **kwargs):
+        page_cache = RecipePageCache(request)
+        data = page_cache.get()
+        if data is not None:
+            return Response(data)
+        # A page that is going to be cached is read from the primary.
+        with primary_reads() if page_cache.enabled else nullcontext():
+            response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            page_cache.set(response.data)
+        return response
+
+    @method_decorator(vary_on_headers('Authorization'))
+    @conditional(recipe_detail_state)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         instance = self.perform_create(serializer)
+        instance = self.get_read_queryset().get(pk=instance.pk)
         responce_serializer = RecipeReadOnlySerializer(
             instance=instance,
             context={'request': request}
@@ -145,7 +246,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return serializer.save(author=self.request.user)
 
     def perform_destroy(self, instance):
-        instance.image.delete(save=True)
+        schedule_image_delete(instance.image.name)
         instance.delete()
 
     def update(self, request, *args, **kwargs):
@@ -156,9 +257,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                          partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-
-        if getattr(instance, '_prefetched_objects_cache', None):
-            instance._prefetched_objects_cache = {}
+        instance = self.get_read_queryset().get(pk=instance.pk)
         responce_serializer = RecipeReadOnlySerializer(
             instance=instance,
             context={'request': request}
@@ -169,41 +268,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True,
             methods=['post'],
             permission_classes=[IsAuthenticated])
-    @m2m_set('favorites', RECIPE_ALREADY_IN_FAVORITES)
+    @m2m_set('favorites', RECIPE_ALREADY_IN_FAVORITES,
+             counter_field='favorites_count')
     def favorite(self, request, pk=None):
         return
 
     @favorite.mapping.delete
-    @m2m_unset('favorites', DELETE_NONEXIST_FAVORITE)
+    @m2m_unset('favorites', DELETE_NONEXIST_FAVORITE,
+               counter_field='favorites_count')
     def delete_from_fovorites(self, request, pk=None):
         return
 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        ids = similar_recipe_ids(recipe.pk,
+                                 get_recipes_limit(request, 'limit'))
+        recipes = Recipe.objects.in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True
+        )
+        return Response(serializer.data)
+
     @action(detail=False,
             methods=['get'],
-            permission_classes=[IsAuthenticated])
+            pagination_class=FoodgramPagination)
+    def by_ingredients(self, request):
+        try:
+            ingredient_ids = [
+                int(value)
+                for value in request.query_params.getlist('ingredients')
+            ]
+        except ValueError:
+            ingredient_ids = None
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': self.INGREDIENTS_REQUIRED})
+        max_missing = request.query_params.get('max_missing')
+        if max_missing is not None:
+            try:
+                max_missing = int(max_missing)
+            except ValueError:
+                max_missing = -1
+            if max_missing < 0:
+                raise ValidationError(
+                    {'max_missing': self.INVALID_MAX_MISSING}
+                )
+        page = self.paginate_queryset(rank_recipes(ingredient_ids,
+                                                   max_missing))
+        recipes = self.get_read_queryset().in_bulk(
+            [int(pk) for pk, _ in page]
+        )
+        results = []
+        for pk, missing in page:
+            recipe = recipes.get(int(pk))
+            if recipe is not None:
+                recipe.missing_ingredients = int(missing)
+                results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        if any(name in request.query_params
+               for name in RecipeFilterSet.Meta.fields):
+            queryset = self.filter_queryset(
+                self.get_read_queryset().feed_of(request.user)
+            )
+            page = self.paginate_queryset(queryset)
+        else:
+            page = self.paginate_queryset(FeedTimeline(request.user))
+            recipes = self.get_read_queryset().in_bulk(
+                [pk for _, pk in page]
+            )
+            page = [recipes[pk] for _, pk in page if pk in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS,
+            content_negotiation_class=FormatNegotiation)
     def download_shopping_cart(self, request):
-        cart = request.user.shopping_list.all()
-        ingr_amount = shopping_list_as_dict(cart)
-        response = HttpResponse(
-            'Список покупок: \n',
+        renderer = request.accepted_renderer
+        rows = shopping_list_rows(request.user).iterator()
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type};charset={renderer.charset}'
+        return StreamingHttpResponse(
+            renderer.stream(rows),
             headers={
-                'Content-Type': 'text/plain;charset=UTF-8',
-                "Content-Disposition":
-                    'attachment; filename="shopping_list.txt"'
+                'Content-Type': content_type,
+                'Content-Disposition':
+                    'attachment; '
+                    f'filename="shopping_list.{renderer.format}"'
             }
         )
-        fill_cart_file(ingr_amount, response)
-        return response
+
+    @action(detail=False,
+            methods=['get'],
+            url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_preview(self, request):
+        totals = shopping_cart_totals(request.user).select_related(
+            'ingredient'
+        )
+        serializer = CartTotalSerializer(totals, many=True)
+        return Response(serializer.data)
 
     @action(detail=True,
             methods=['post'],
             permission_classes=[IsAuthenticated])
-    @m2m_set('shopping_list', RECIPE_ALREADY_IN_SHOPPING_CART)
+    @m2m_set('shopping_list', RECIPE_ALREADY_IN_SHOPPING_CART,
+             counter_field='shopping_cart_count')
     def shopping_cart(self, request, pk=None):
         return
 
     @shopping_cart.mapping.delete
-    @m2m_unset('shopping_list', DELETE_NONEXIST_SHOPPING_CART)
+    @m2m_unset('shopping_list', DELETE_NONEXIST_SHOPPING_CART,
+               counter_field='shopping_cart_count')
     def delete_from_shopping_cart(self, request, pk=None):
         return
 
@@ -213,11 +400,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
             permission_classes=[AllowAny])
     def get_link(self, request, pk=None):
         recipe = self.get_object()
-        if not hasattr(recipe, 'shortlink'):
-            ShortLink.objects.create(recipe=recipe)
+        link, _ = ShortLink.objects.get_or_create(
+            recipe=recipe,
+            defaults={'link_uri': link_uri_for(recipe.pk)}
+        )
         domain = settings.FOODGRAM['REDIRECT_URL']
         url = (f'{domain}/'
-               f's/{recipe.shortlink.link_uri}/')
+               f's/{link.link_uri}/')
         data = {'short-link': url}
         return Response(data, status=status.HTTP_200_OK)
 
@@ -226,8 +415,7 @@ class RecipeLinkView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug):
-        link_obj = get_object_or_404(ShortLink, link_uri=slug)
-        domain = settings.FOODGRAM['REDIRECT_URL']
-        url = (f'{domain}/'
-               f'recipes/{link_obj.recipe.id}')
-        return redirect(url)
+        recipe_id = get_link_recipe_id(slug)
+        if recipe_id is None:
+            raise Http404
+        return redirect(recipe_redirect_url(recipe_id))
@@ -9,8 +9,21 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+
+class FoodgramASGIHandler(ASGIHandler):
+    # The URL configuration is picked per request, so the settings stay
+    # the same for WSGI, management commands and ASGI.
+    urlconf = 'backend.asgi_urls'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False)
+application = FoodgramASGIHandler()
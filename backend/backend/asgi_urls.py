@@ -0,0 +1,14 @@
+"""URL configuration of the ASGI application.
+
+Mirrors backend.urls, with read-heavy endpoints served by async views.
+"""
+from django.contrib import admin
+from django.urls import include, path, re_path
+
+from api.async_views import recipe_link
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('api.asgi_urls')),
+    re_path(r's/(?P<slug>\w+)/', recipe_link, name='recipe-link'),
+]
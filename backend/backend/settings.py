@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -29,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
+    'api.middleware.replica_routing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -67,6 +70,10 @@ AUTH_USER_MODEL = 'users.User'
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# DB_ENGINE=sqlite runs the project (and the benchmark command) on a
+# local SQLite file without PostgreSQL.
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -74,10 +81,48 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_PGBOUNCER', '0') == '1',
     }
 }
 
+if DB_ENGINE == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    }
+elif os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+
+# Cache versions, cached pages and the ingredient index change log have
+# to be seen by every worker, so the default cache is Redis.
+# FOODGRAM_CACHE=locmem keeps everything in the process and is only
+# correct for a single process (tests, runserver, benchmark).
+CACHE_SHARED = os.getenv('FOODGRAM_CACHE', 'redis') != 'locmem'
+
+if CACHE_SHARED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://redis:6379/0'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -137,5 +182,46 @@ FOODGRAM = {
     'AVATAR_STORAGE': 'users/avatars',
     'IMAGE_STORAGE': 'recipes/images',
     'DEFAULT_PAGE_SIZE': 6,
-    'REDIRECT_URL': os.getenv('FOODGRAM_REDIRECT_URL', 'http://localhost')
+    'REDIRECT_URL': os.getenv('FOODGRAM_REDIRECT_URL', 'http://localhost'),
+    'PDF_FONT': os.getenv('FOODGRAM_PDF_FONT',
+                          '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'),
+    'IMAGE_RENDITIONS': {
+        'thumbnail': (320, 320),
+        'card': (800, 800),
+        'full': (1600, 1600),
+    },
+    'IMAGE_WORKERS': int(os.getenv('FOODGRAM_IMAGE_WORKERS', 2)),
+    'FEED': {
+        'FANOUT_LIMIT': 1000,
+        'BACKFILL': 100,
+    },
+    'SIMILAR': {
+        'PATH': os.getenv('FOODGRAM_SIMILAR_PATH', BASE_DIR / 'similar'),
+        'NEIGHBORS': 20,
+    },
+    'PANTRY': {
+        'MAX_LAG': 1000,
+        'CHANGE_TIMEOUT': 24 * 60 * 60,
+    },
+    'PAGE_CACHE': {
+        'CACHE': os.getenv('FOODGRAM_PAGE_CACHE', 'default'),
+        'TIMEOUT': 300,
+    },
+    'INSTRUMENTATION': {
+        'ENABLED': os.getenv('FOODGRAM_INSTRUMENTATION', '0') == '1',
+        'CACHE': 'default',
+        'SLOT_SECONDS': 60,
+        'WINDOW_SLOTS': 15,
+        'QUERY_BUDGETS': {
+            'GET recipe-list': 6,
+            'GET recipe-detail': 5,
+            'GET recipe-download-shopping-cart': 1,
+            'GET recipe-shopping-cart-preview': 1,
+            'GET user-subscriptions': 4,
+            'GET recipe-feed': 9,
+            'GET recipe-by-ingredients': 4,
+            'GET tag-list': 1,
+            'GET ingredient-list': 1,
+        },
+    },
 }
@@ -0,0 +1,14 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Tests run on SQLite with a process-local cache unless DB_ENGINE or
+# FOODGRAM_CACHE say otherwise.
+os.environ.setdefault('DB_ENGINE', 'sqlite')
+os.environ.setdefault('FOODGRAM_CACHE', 'locmem')
+
+from .settings import *  # noqa: E402,F401,F403
+
+MEDIA_ROOT = Path(tempfile.gettempdir()) / 'foodgram-test-media'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,28 @@
+import pytest
+from django.core.cache import caches
+
+from api import instrumentation
+
+
+@pytest.fixture
+def query_budget():
+    """Контекстный менеджер, который падает при превышении бюджета.
+
+    Бюджет задается числом или именем эндпоинта из
+    FOODGRAM['INSTRUMENTATION']['QUERY_BUDGETS'], например
+    query_budget('GET recipe-detail').
+    """
+    budgets = instrumentation.SETTINGS.get('QUERY_BUDGETS', {})
+
+    def budget(limit):
+        if isinstance(limit, str):
+            limit = budgets[limit]
+        return instrumentation.query_budget(limit)
+
+    return budget
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
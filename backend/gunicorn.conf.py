@@ -0,0 +1,23 @@
+import multiprocessing
+import os
+
+bind = '0.0.0.0:8000'
+
+# Every worker thread keeps its own persistent database connection
+# (one per alias), so workers * threads must fit max_connections.
+workers = int(os.getenv('GUNICORN_WORKERS',
+                        multiprocessing.cpu_count() * 2 + 1))
+if os.getenv('FOODGRAM_CACHE') == 'locmem':
+    # A process-local cache cannot invalidate other workers.
+    workers = 1
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 100
+
+if os.getenv('FOODGRAM_SERVER', 'wsgi') == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'
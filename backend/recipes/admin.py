@@ -34,7 +34,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @display(description='Добавлен в избранное')
     def times_favorited(self, obj):
-        return obj.is_favorited_by.count()
+        return obj.favorites_count
 
 
 admin.site.register(Ingredient, IngredientAdmin)
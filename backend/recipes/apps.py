@@ -1,6 +1,45 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from .cart import carted_recipe_deleted, shopping_cart_changed
+        from .counters import recipe_created, recipe_deleted
+        from .feed import recipe_published, subscriptions_changed
+        from .models import Recipe, Recipe_Ingredient
+        from .pantry import recipe_removed
+        from .reference import REFERENCE_DATA, invalidate_reference_data
+        from .versions import (favorites_changed, recipe_changed,
+                               recipe_part_changed, user_changed,
+                               user_list_m2m_changed)
+        User = get_user_model()
+        post_save.connect(recipe_created, sender=Recipe)
+        post_delete.connect(recipe_deleted, sender=Recipe)
+        post_save.connect(recipe_changed, sender=Recipe)
+        post_delete.connect(recipe_changed, sender=Recipe)
+        post_save.connect(recipe_part_changed, sender=Recipe_Ingredient)
+        post_delete.connect(recipe_part_changed, sender=Recipe_Ingredient)
+        m2m_changed.connect(recipe_part_changed, sender=Recipe.tags.through)
+        post_save.connect(recipe_published, sender=Recipe)
+        pre_delete.connect(recipe_removed, sender=Recipe)
+        pre_delete.connect(carted_recipe_deleted, sender=Recipe)
+        m2m_changed.connect(shopping_cart_changed,
+                            sender=User.shopping_list.through)
+        m2m_changed.connect(subscriptions_changed,
+                            sender=User.subscriptions.through)
+        post_save.connect(user_changed, sender=User)
+        post_delete.connect(user_changed, sender=User)
+        for through in (User.favorites.through,
+                        User.shopping_list.through,
+                        User.subscriptions.through):
+            m2m_changed.connect(user_list_m2m_changed, sender=through)
+        m2m_changed.connect(favorites_changed, sender=User.favorites.through)
+        for model in REFERENCE_DATA:
+            post_save.connect(invalidate_reference_data, sender=model)
+            post_delete.connect(invalidate_reference_data, sender=model)
@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db.models import (Case, Count, F, IntegerField, OuterRef,
+                              Subquery, Sum, Value, When)
+
+from .models import CartTotal, Recipe_Ingredient
+
+BATCH_SIZE = 1000
+
+
+def expected_totals(recipe_ingredient_model):
+    return (
+        recipe_ingredient_model.objects
+        .filter(recipe__in_shopping_list_of__isnull=False)
+        .values('ingredient', user=F('recipe__in_shopping_list_of'))
+        .annotate(total_amount=Sum('amount'), recipes_count=Count('recipe'))
+        .order_by('user', 'ingredient_id')
+    )
+
+
+def rebuild_cart_totals(cart_model, recipe_ingredient_model):
+    cart_model.objects.all().delete()
+    cart_model.objects.bulk_create(
+        (cart_model(user_id=row['user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total_amount'],
+                    recipes_count=row['recipes_count'])
+         for row in expected_totals(recipe_ingredient_model).iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+def carted_by(recipe_id, users=None):
+    carts = get_user_model().shopping_list.through.objects.filter(
+        recipe=recipe_id
+    )
+    if users is not None:
+        carts = carts.filter(user__in=users)
+    return carts.values('user')
+
+
+def add_recipe(user_ids, recipe_id):
+    ingredients = Recipe_Ingredient.objects.filter(recipe=recipe_id)
+    ingredient_ids = list(ingredients.values_list('ingredient', flat=True))
+    CartTotal.objects.bulk_create(
+        (CartTotal(user_id=user_id, ingredient_id=ingredient_id)
+         for user_id in user_ids
+         for ingredient_id in ingredient_ids),
+        ignore_conflicts=True
+    )
+    change_totals(user_ids, ingredients, 1)
+
+
+def remove_recipe(users, recipe_id):
+    change_totals(users, Recipe_Ingredient.objects.filter(recipe=recipe_id),
+                  -1)
+
+
+def change_totals(users, ingredients, sign):
+    # Rows that drop to zero recipes are kept and skipped on read:
+    # deleting them could race with a concurrent add that has just
+    # found the row and is about to increment it.
+    CartTotal.objects.filter(
+        user__in=users,
+        ingredient__in=ingredients.values('ingredient')
+    ).update(
+        amount=F('amount') + sign * Subquery(
+            ingredients.filter(ingredient=OuterRef('ingredient'))
+            .values('amount')
+        ),
+        recipes_count=F('recipes_count') + sign
+    )
+
+
+def delta_case(changes, position):
+    return Case(
+        *(When(ingredient=ingredient_id, then=Value(delta[position]))
+          for ingredient_id, delta in changes.items()),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def update_carts(recipe_id, changes):
+    """Переносит правку ингредиентов рецепта в корзины с этим рецептом.
+
+    changes: {id ингредиента: (изменение количества,
+    изменение числа рецептов)}.
+    """
+    carts = carted_by(recipe_id)
+    added = [ingredient_id for ingredient_id, (_, count) in changes.items()
+             if count > 0]
+    if added:
+        CartTotal.objects.bulk_create(
+            (CartTotal(user_id=user_id, ingredient_id=ingredient_id)
+             for user_id in carts.values_list('user', flat=True)
+             for ingredient_id in added),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+    CartTotal.objects.filter(
+        user__in=carts, ingredient__in=list(changes)
+    ).update(
+        amount=F('amount') + delta_case(changes, 0),
+        recipes_count=F('recipes_count') + delta_case(changes, 1)
+    )
+
+
+def shopping_cart_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    # Runs in the transaction that changes the cart. Removals are
+    # handled before the through rows are deleted, while it is still
+    # known which of the recipes were actually in the cart.
+    if action == 'post_add':
+        if reverse:
+            add_recipe(pk_set, instance.pk)
+        else:
+            for recipe_id in pk_set:
+                add_recipe((instance.pk,), recipe_id)
+    elif action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            remove_recipe(carted_by(instance.pk, pk_set), instance.pk)
+        elif action == 'pre_clear':
+            CartTotal.objects.filter(user=instance).delete()
+        else:
+            for recipe_id in pk_set:
+                remove_recipe(carted_by(recipe_id, (instance.pk,)),
+                              recipe_id)
+
+
+def carted_recipe_deleted(sender, instance, **kwargs):
+    remove_recipe(carted_by(instance.pk), instance.pk)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+def rebuild_counters(recipe_model, user_model):
+    recipe_model.objects.update(
+        favorites_count=count_subquery(user_model.favorites.through,
+                                       'recipe'),
+        shopping_cart_count=count_subquery(
+            user_model.shopping_list.through,
+            'recipe'
+        )
+    )
+    user_model.objects.update(
+        recipes_count=count_subquery(recipe_model, 'author')
+    )
+
+
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(get_user_model(), instance.author_id,
+                       'recipes_count', 1)
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(get_user_model(), instance.author_id, 'recipes_count', -1)
@@ -0,0 +1,162 @@
+import copy
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from .models import FeedEntry, Recipe
+
+SETTINGS = settings.FOODGRAM.get('FEED', {})
+FANOUT_LIMIT = SETTINGS.get('FANOUT_LIMIT', 1000)
+BACKFILL = SETTINGS.get('BACKFILL', 100)
+BATCH_SIZE = 1000
+
+
+def follower_ids(subscription_model, author_id, limit=None):
+    followers = (subscription_model.objects
+                 .filter(to_user=author_id)
+                 .values_list('from_user', flat=True))
+    return list(followers if limit is None else followers[:limit])
+
+
+def add_entries(feed_model, user_ids, recipes):
+    feed_model.objects.bulk_create(
+        (feed_model(user_id=user_id, recipe_id=recipe.pk,
+                    author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for user_id in user_ids
+         for recipe in recipes),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out(feed_model, user_model, recipe):
+    # Authors with more followers than FANOUT_LIMIT switch to
+    # fan-out-on-read for good: their recipes are merged into the feed
+    # by FeedTimeline instead of being copied.
+    author = recipe.author
+    if author.feed_on_read:
+        return
+    Subscriptions = user_model.subscriptions.through
+    followers = follower_ids(Subscriptions, author.pk, FANOUT_LIMIT + 1)
+    if len(followers) > FANOUT_LIMIT:
+        user_model.objects.filter(pk=author.pk).update(feed_on_read=True)
+        return
+    add_entries(feed_model, followers, (recipe,))
+
+
+def backfill(feed_model, recipe_model, user_id, author):
+    if author.feed_on_read:
+        return
+    recipes = (recipe_model.objects
+               .filter(author=author)
+               .order_by('-pub_date')[:BACKFILL])
+    add_entries(feed_model, (user_id,), recipes)
+
+
+def rebuild_feed(feed_model, recipe_model, user_model):
+    feed_model.objects.all().delete()
+    Subscriptions = user_model.subscriptions.through
+    authors = user_model.objects.filter(
+        pk__in=Subscriptions.objects.values('to_user')
+    )
+    for author in authors:
+        followers = follower_ids(Subscriptions, author.pk)
+        if author.feed_on_read:
+            continue
+        if len(followers) > FANOUT_LIMIT:
+            user_model.objects.filter(pk=author.pk).update(feed_on_read=True)
+            continue
+        recipes = (recipe_model.objects
+                   .filter(author=author)
+                   .order_by('-pub_date')[:BACKFILL])
+        add_entries(feed_model, followers, list(recipes))
+
+
+class FeedTimeline:
+    """Лента пользователя в порядке (-pub_date, -id).
+
+    Записи ленты читаются по индексу (user, -pub_date), рецепты авторов
+    с лентой при чтении - вторым запросом с тем же ограничением, затем
+    обе выборки сливаются. Срез возвращает пары (pub_date, id рецепта).
+    """
+
+    def __init__(self, user, position=None):
+        self.user = user
+        self.position = position
+        self.on_read_authors = list(
+            user.subscriptions
+            .filter(feed_on_read=True)
+            .values_list('pk', flat=True)
+        )
+
+    def seek(self, position):
+        timeline = copy.copy(self)
+        timeline.position = position
+        return timeline
+
+    def after_position(self, queryset, recipe_field):
+        if self.position is None:
+            return queryset
+        pub_date, pk = self.position
+        return queryset.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, **{f'{recipe_field}__lt': pk})
+        )
+
+    def sources(self):
+        # Entries copied before an author switched to fan-out-on-read
+        # are skipped, the author's recipes come from the second query.
+        entries = (FeedEntry.objects
+                   .filter(user=self.user)
+                   .order_by('-pub_date', '-recipe')
+                   .values_list('pub_date', 'recipe'))
+        sources = [self.after_position(entries, 'recipe')]
+        if self.on_read_authors:
+            sources[0] = sources[0].exclude(author__in=self.on_read_authors)
+            recipes = (Recipe.objects
+                       .filter(author__in=self.on_read_authors)
+                       .order_by('-pub_date', '-id')
+                       .values_list('pub_date', 'id'))
+            sources.append(self.after_position(recipes, 'id'))
+        return sources
+
+    def count(self):
+        return sum(source.count() for source in self.sources())
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.stop is None:
+            raise TypeError('FeedTimeline supports only bounded slices.')
+        start = key.start or 0
+        rows = heapq.merge(*(source[:key.stop]
+                             for source in self.sources()),
+                           reverse=True)
+        return list(islice(rows, start, key.stop))
+
+
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        fan_out(FeedEntry, get_user_model(), instance)
+
+
+def subscriptions_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if action == 'post_add':
+        if reverse:
+            for user_id in pk_set:
+                backfill(FeedEntry, Recipe, user_id, instance)
+        else:
+            for author in get_user_model().objects.filter(pk__in=pk_set):
+                backfill(FeedEntry, Recipe, instance.pk, author)
+    elif action in ('post_remove', 'post_clear'):
+        if reverse:
+            entries = FeedEntry.objects.filter(author=instance)
+            lookup = 'user__in'
+        else:
+            entries = FeedEntry.objects.filter(user=instance)
+            lookup = 'author__in'
+        if action == 'post_remove':
+            entries = entries.filter(**{lookup: pk_set})
+        entries.delete()
@@ -0,0 +1,141 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from recipes.models import Recipe, Recipe_Ingredient
+from recipes.similar import NEIGHBORS, get_index, write_index
+
+CHUNK_SIZE = 256
+SAMPLE_SIZE = 8192
+
+
+def build_matrix(pairs):
+    """TF-IDF матрица рецепт x ингредиент с нормированными строками."""
+    ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    _, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns))
+    )
+    document_frequency = np.bincount(columns)
+    idf = np.log((1 + len(ids)) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    return ids, (sparse.diags((1 / norms).astype(np.float32))
+                 @ matrix).tocsr()
+
+
+def similarity_chunks(matrix, rows):
+    # Shared ingredients like salt make most rows overlap, so each block
+    # of similarities is computed dense: sparse matrix times dense block.
+    # Block rows are all recipes, columns are the recipes of the chunk.
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        yield chunk, matrix @ matrix[chunk].T.toarray()
+
+
+def top_neighbors(ids, matrix, rows, neighbors, scores):
+    count = min(neighbors.shape[1], len(ids) - 1)
+    if count < 1:
+        return
+    sample_size = min(len(ids), SAMPLE_SIZE)
+    for chunk, similarity in similarity_chunks(matrix, rows):
+        positions = np.arange(len(chunk))
+        similarity[chunk, positions] = -1
+        # The count-th best score among the first recipes can only be
+        # lower than the real one, so it safely prunes the candidates
+        # before the exact selection.
+        threshold = np.partition(similarity[:sample_size], -count,
+                                 axis=0)[-count]
+        candidates, positions = np.divmod(np.flatnonzero(
+            (similarity >= threshold) & (similarity > 0)
+        ), len(chunk))
+        order = np.argsort(positions, kind='stable')
+        candidates, positions = candidates[order], positions[order]
+        values = similarity[candidates, positions]
+        bounds = np.searchsorted(positions, np.arange(len(chunk) + 1))
+        neighbors[chunk] = -1
+        scores[chunk] = 0
+        for position, row in enumerate(chunk):
+            start, end = bounds[position:position + 2]
+            best = np.lexsort((ids[candidates[start:end]],
+                               -values[start:end]))[:count]
+            neighbors[row, :len(best)] = ids[candidates[start:end][best]]
+            scores[row, :len(best)] = values[start:end][best]
+
+
+class Command(BaseCommand):
+    help = ('Строит индекс похожих рецептов. По умолчанию пересчитываются '
+            'только соседи рецептов, на которые повлияли изменения с '
+            'прошлой сборки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--neighbors', type=int, default=NEIGHBORS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built_at = timezone.now()
+        pairs = np.array(
+            list(Recipe_Ingredient.objects
+                 .order_by()
+                 .values_list('recipe_id', 'ingredient_id')),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        if not len(pairs):
+            self.stdout.write('Нет рецептов с ингредиентами.')
+            return
+        ids, matrix = build_matrix(pairs)
+        count = options['neighbors']
+        neighbors = np.full((len(ids), count), -1, dtype=np.int64)
+        scores = np.zeros((len(ids), count), dtype=np.float32)
+        previous = get_index()
+        if (options['full'] or previous is None
+                or previous.manifest['neighbors'] != count):
+            affected = np.arange(len(ids))
+        else:
+            affected = self.reuse(previous, ids, matrix, neighbors, scores)
+        top_neighbors(ids, matrix, affected, neighbors, scores)
+        write_index(ids, neighbors, scores, {
+            'built_at': built_at.isoformat(),
+            'neighbors': count,
+            'recipes': len(ids),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс построен: рецептов {len(ids)}, пересчитано '
+            f'{len(affected)} за {time.perf_counter() - started:.1f} с.'
+        ))
+
+    def reuse(self, previous, ids, matrix, neighbors, scores):
+        """Копирует неизменившихся соседей и возвращает строки для пересчета.
+
+        Пересчитываются измененные и новые рецепты, рецепты, среди
+        соседей которых были измененные или удаленные, и рецепты, которым
+        новый вариант изменившегося рецепта ближе последнего соседа.
+        Веса IDF остальных строк обновляет только полная сборка.
+        """
+        built_at = parse_datetime(previous.manifest['built_at'])
+        old_rows = np.searchsorted(previous.ids, ids)
+        old_rows[old_rows == len(previous.ids)] = 0
+        known = previous.ids[old_rows] == ids
+        neighbors[known] = previous.neighbors[old_rows[known]]
+        scores[known] = previous.scores[old_rows[known]]
+        changed_ids = np.union1d(
+            np.fromiter(Recipe.objects
+                        .filter(updated_at__gte=built_at)
+                        .values_list('pk', flat=True), dtype=np.int64),
+            ids[~known]
+        )
+        touched = np.union1d(changed_ids,
+                             np.setdiff1d(previous.ids, ids))
+        changed = np.flatnonzero(np.isin(ids, changed_ids))
+        affected = ~known | np.isin(neighbors, touched).any(axis=1)
+        affected[changed] = True
+        closest = np.zeros(len(ids), dtype=np.float32)
+        for _, similarity in similarity_chunks(matrix, changed):
+            closest = np.maximum(closest, similarity.max(axis=1))
+        affected |= closest > scores[:, -1]
+        return np.flatnonzero(affected)
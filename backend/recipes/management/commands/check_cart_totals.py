@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cart import expected_totals, rebuild_cart_totals
+from recipes.models import CartTotal, Recipe_Ingredient
+
+
+def compare(stored, expected):
+    # Both sides are ordered by (user, ingredient), so the tables are
+    # compared in one merge pass without loading them into memory.
+    stored, expected = iter(stored), iter(expected)
+    left, right = next(stored, None), next(expected, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left[:2] < right[:2]):
+            yield left[:2], left[2:], None
+            left = next(stored, None)
+        elif left is None or right[:2] < left[:2]:
+            yield right[:2], None, right[2:]
+            right = next(expected, None)
+        else:
+            if left[2:] != right[2:]:
+                yield left[:2], left[2:], right[2:]
+            left, right = next(stored, None), next(expected, None)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет итоги списков покупок с полным пересчетом по '
+            'корзинам, с флагом --fix пересобирает их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+        parser.add_argument('--show', type=int, default=20)
+
+    def handle(self, *args, **options):
+        stored = (CartTotal.objects
+                  .filter(recipes_count__gt=0)
+                  .order_by('user_id', 'ingredient_id')
+                  .values_list('user', 'ingredient', 'amount',
+                               'recipes_count'))
+        expected = expected_totals(Recipe_Ingredient).values_list(
+            'user', 'ingredient', 'total_amount', 'recipes_count'
+        )
+        with transaction.atomic():
+            mismatches = 0
+            for key, actual, correct in compare(stored.iterator(),
+                                                expected.iterator()):
+                mismatches += 1
+                if mismatches <= options['show']:
+                    self.stdout.write(
+                        f'user={key[0]} ingredient={key[1]}: '
+                        f'сохранено {actual}, должно быть {correct}'
+                    )
+            if mismatches and options['fix']:
+                rebuild_cart_totals(CartTotal, Recipe_Ingredient)
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено расхождений: {mismatches}.'
+            ))
+        else:
+            raise CommandError(f'Найдено расхождений: {mismatches}.')
@@ -0,0 +1,131 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient
+from recipes.reference import get_reference_data
+
+DEFAULT_BATCH_SIZE = 1000
+
+JSON_READ_CHUNK_SIZE = 64 * 1024
+
+JSON_FIELDS = ('name', 'measurement_unit')
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def iter_json(file):
+    # Decodes the top-level array one object at a time, so large
+    # catalogues are never held in memory as a whole.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = finished = False
+    for chunk in iter(lambda: file.read(JSON_READ_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while not finished:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                finished = True
+                position += 1
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The object goes on in the next chunk.
+                break
+            yield json_row(item)
+    if not finished or buffer[position:].strip():
+        raise CommandError(
+            'Файл оборван или поврежден: после последнего прочитанного '
+            f'ингредиента идет {buffer[position:position + 50]!r}.'
+        )
+
+
+def json_row(item):
+    if not isinstance(item, dict) or not all(
+        isinstance(item.get(key), str) for key in JSON_FIELDS
+    ):
+        raise CommandError(
+            f'У ингредиента {item!r} должны быть строковые поля '
+            f'{" и ".join(JSON_FIELDS)}.'
+        )
+    return tuple(item[key] for key in JSON_FIELDS)
+
+
+READERS = {
+    '.csv': iter_csv,
+    '.json': iter_json,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV- или JSON-файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f'Неподдерживаемый формат файла: {path.suffix}'
+            )
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        start = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        total = 0
+        # A broken file is reported before anything is loaded from it.
+        with open(path, encoding='utf-8', newline='') as file, \
+                transaction.atomic():
+            rows = self.unique_rows(reader(file))
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=name, measurement_unit=unit)
+                     for name, unit in batch),
+                    ignore_conflicts=True
+                )
+                total += len(batch)
+        get_reference_data(Ingredient).invalidate()
+        created = Ingredient.objects.count() - count_before
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {created}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с.'
+        ))
+
+    def unique_rows(self, rows):
+        seen = set()
+        for name, unit in rows:
+            key = (name.strip(), unit.strip())
+            if not all(key) or key in seen:
+                continue
+            seen.add(key)
+            yield key
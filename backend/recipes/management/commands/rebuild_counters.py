@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import rebuild_counters
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного, списков покупок '
+            'и рецептов авторов.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_counters(Recipe, get_user_model())
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
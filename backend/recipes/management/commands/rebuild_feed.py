@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feed
+from recipes.models import FeedEntry, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет ленты подписок пользователей.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_feed(FeedEntry, Recipe, get_user_model())
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны.'))
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_SETTINGS = settings.FOODGRAM.get('FEED', {})
+FANOUT_LIMIT = FEED_SETTINGS.get('FANOUT_LIMIT', 1000)
+BACKFILL = FEED_SETTINGS.get('BACKFILL', 100)
+BATCH_SIZE = 1000
+
+
+def fill_feed(apps, schema_editor):
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Subscriptions = User.subscriptions.through
+    authors = User.objects.filter(
+        pk__in=Subscriptions.objects.values('to_user')
+    )
+    for author in authors:
+        if author.feed_on_read:
+            continue
+        followers = list(Subscriptions.objects
+                         .filter(to_user=author.pk)
+                         .values_list('from_user', flat=True))
+        if len(followers) > FANOUT_LIMIT:
+            User.objects.filter(pk=author.pk).update(feed_on_read=True)
+            continue
+        recipes = list(Recipe.objects
+                       .filter(author=author)
+                       .order_by('-pub_date')[:BACKFILL])
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                       author_id=recipe.author_id)
+             for user_id in followers
+             for recipe in recipes),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_tags_tag_recipe_idx'),
+        ('users', '0006_user_feed_on_read'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_cart_totals(apps, schema_editor):
+    CartTotal = apps.get_model('recipes', 'CartTotal')
+    Recipe_Ingredient = apps.get_model('recipes', 'Recipe_Ingredient')
+    totals = (
+        Recipe_Ingredient.objects
+        .filter(recipe__in_shopping_list_of__isnull=False)
+        .values('ingredient', user=F('recipe__in_shopping_list_of'))
+        .annotate(total_amount=Sum('amount'), recipes_count=Count('recipe'))
+        .order_by('user', 'ingredient_id')
+    )
+    CartTotal.objects.bulk_create(
+        (CartTotal(user_id=row['user'],
+                   ingredient_id=row['ingredient'],
+                   amount=row['total_amount'],
+                   recipes_count=row['recipes_count'])
+         for row in totals.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов в корзине')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='carttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_total'),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.16 on 2026-10-18 21:40
+
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_renditions(apps, schema_editor):
+    # Renditions are written by api.images; the JPEG of the last size is
+    # written last, so images that have it are complete.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    sizes = list(settings.FOODGRAM['IMAGE_RENDITIONS'])
+    ready = []
+    for recipe in Recipe.objects.exclude(image='').only('image').iterator():
+        path = PurePosixPath(recipe.image.name)
+        marker = path.parent / 'renditions' / f'{path.stem}_{sizes[-1]}.jpeg'
+        if default_storage.exists(str(marker)):
+            recipe.renditions = sizes
+            ready.append(recipe)
+    Recipe.objects.bulk_update(ready, ['renditions'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_feedentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Готовые размеры изображения'),
+        ),
+        migrations.RunPython(fill_renditions, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import (BooleanField, Exists, F, OuterRef, Q, Value,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.db.models.constraints import UniqueConstraint
 
 from .constants import (AMOUNT_ERR_MSG,
@@ -58,6 +62,59 @@ class Ingredient(models.Model):
         return self.name
 
 
+def in_user_list(through, user):
+    return Exists(through.objects.filter(user=user, recipe=OuterRef('pk')))
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=in_user_list(User.favorites.through, user),
+            is_in_shopping_cart=in_user_list(User.shopping_list.through,
+                                             user)
+        )
+
+    def with_any_tag(self, tags):
+        return self.filter(Exists(
+            self.model.tags.through.objects.filter(recipe=OuterRef('pk'),
+                                                   tag__in=tags)
+        ))
+
+    def feed_of(self, user):
+        return self.filter(
+            Q(Exists(FeedEntry.objects.filter(user=user,
+                                              recipe=OuterRef('pk'))))
+            | Q(author__in=user.subscriptions.filter(feed_on_read=True))
+        )
+
+    def latest_per_author(self, limit):
+        ranked = (
+            self.annotate(
+                author_position=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author'),
+                    order_by=F('pub_date').desc()
+                )
+            )
+            .order_by()
+            .values('pk', 'author_position')
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(
+            pk__in=RawSQL(
+                f'SELECT ranked.id FROM ({sql}) ranked '
+                'WHERE ranked.author_position <= %s',
+                (*params, limit)
+            )
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -93,11 +150,41 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлен в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлен в списки покупок',
+        default=0,
+        editable=False
+    )
+    renditions = models.JSONField(
+        verbose_name='Готовые размеры изображения',
+        default=list,
+        blank=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['-favorites_count', '-pub_date'],
+                         name='recipe_popularity_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx')
+        ]
 
     def __str__(self):
         return f'{self.author} - {self.name}'
@@ -124,3 +211,72 @@ class Recipe_Ingredient(models.Model):
             UniqueConstraint(fields=['recipe', 'ingredient'],
                              name='unique_recipe_ingredient')
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            UniqueConstraint(fields=['user', 'recipe'],
+                             name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date_idx')
+        ]
+
+
+class CartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='cart_totals',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    amount = models.BigIntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов в корзине',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            UniqueConstraint(fields=['user', 'ingredient'],
+                             name='unique_cart_total')
+        ]
@@ -0,0 +1,173 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import Recipe_Ingredient
+
+SETTINGS = settings.FOODGRAM.get('PANTRY', {})
+MAX_LAG = SETTINGS.get('MAX_LAG', 1000)
+CHANGE_TIMEOUT = SETTINGS.get('CHANGE_TIMEOUT', 24 * 60 * 60)
+GAP_TIMEOUT = 5
+KEY_PREFIX = 'foodgram:pantry'
+SEQUENCE_KEY = f'{KEY_PREFIX}:sequence'
+EMPTY = np.empty(0, dtype=np.int64)
+
+_lock = threading.Lock()
+_loaded = {'index': None}
+
+
+def change_key(sequence):
+    return f'{KEY_PREFIX}:change:{sequence}'
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> отсортированные id рецептов.
+
+    sizes[id] - число ингредиентов рецепта с этим id (0 - рецепта
+    нет), по нему считается, сколько ингредиентов не хватает. sequence -
+    номер последнего изменения из общего журнала в кэше, которое
+    отражено в индексе.
+    """
+
+    def __init__(self, pairs, sequence):
+        ingredients, recipes = pairs.T
+        order = np.lexsort((recipes, ingredients))
+        ingredients, recipes = ingredients[order], recipes[order]
+        keys, starts = np.unique(ingredients, return_index=True)
+        self.postings = dict(zip(keys.tolist(),
+                                 np.split(recipes, starts[1:])))
+        # Recipe ids are dense enough to index an array directly,
+        # counting matches is then a single bincount.
+        self.sizes = np.bincount(recipes).astype(np.int32)
+        self.sequence = sequence
+        self.stalled_since = None
+
+    @classmethod
+    def from_db(cls, sequence):
+        # A lagging replica could miss changes that are already counted
+        # in the sequence, so the index is always read from the primary.
+        database = router.db_for_write(Recipe_Ingredient)
+        pairs = np.array(
+            Recipe_Ingredient.objects.using(database).order_by()
+            .values_list('ingredient_id', 'recipe_id'),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(pairs, sequence)
+
+    def apply(self, recipe_id, removed, added, size):
+        # Changes carry the resulting size, so replaying a change that
+        # is already in the index (e.g. after a rebuild) is harmless.
+        for ingredient_id in removed:
+            posting = self.postings.get(ingredient_id, EMPTY)
+            position = np.searchsorted(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                self.postings[ingredient_id] = np.delete(posting, position)
+        for ingredient_id in added:
+            posting = self.postings.get(ingredient_id, EMPTY)
+            position = np.searchsorted(posting, recipe_id)
+            if position == len(posting) or posting[position] != recipe_id:
+                self.postings[ingredient_id] = np.insert(posting, position,
+                                                         recipe_id)
+        if recipe_id >= len(self.sizes):
+            if not size:
+                return
+            # Grow with headroom so that a run of new recipes does not
+            # copy the array every time.
+            grown = np.zeros(recipe_id + 1 + len(self.sizes) // 8,
+                             dtype=self.sizes.dtype)
+            grown[:len(self.sizes)] = self.sizes
+            self.sizes = grown
+        self.sizes[recipe_id] = size
+
+    def rank(self, ingredient_ids, max_missing=None):
+        """Рецепты, в которых есть хотя бы один из ingredient_ids.
+
+        Возвращает массив пар (id рецепта, сколько ингредиентов не
+        хватает): сначала рецепты, для которых есть все ингредиенты,
+        затем по числу недостающих, по числу имеющихся и новизне.
+        """
+        postings = [self.postings[pk] for pk in set(ingredient_ids)
+                    if pk in self.postings]
+        if not postings:
+            return EMPTY.reshape(0, 2)
+        matched = np.bincount(np.concatenate(postings),
+                              minlength=len(self.sizes))
+        ids = np.flatnonzero(matched)
+        matched = matched[ids]
+        missing = self.sizes[ids] - matched
+        if max_missing is not None:
+            keep = missing <= max_missing
+            ids, matched, missing = ids[keep], matched[keep], missing[keep]
+        # One int64 key sorts faster than lexsort over three arrays:
+        # missing first, then matched descending, then newer recipes
+        # (ids stay below 2**32 and matched below 2**16).
+        key = (((missing.astype(np.int64) << 16) - matched) << 32) - ids
+        order = np.argsort(key)
+        return np.column_stack((ids[order], missing[order]))
+
+
+def get_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def catch_up(index, sequence):
+    # The sequence is incremented before the change is stored, a gap
+    # at the end is usually a change being written right now. A gap
+    # that does not close in GAP_TIMEOUT seconds was evicted.
+    if sequence - index.sequence > MAX_LAG:
+        return False
+    keys = [change_key(number)
+            for number in range(index.sequence + 1, sequence + 1)]
+    changes = cache.get_many(keys)
+    for key in keys:
+        if key not in changes:
+            break
+        index.apply(*changes[key])
+        index.sequence += 1
+    if index.sequence == sequence:
+        index.stalled_since = None
+    elif index.stalled_since is None:
+        index.stalled_since = time.monotonic()
+    return time.monotonic() - (index.stalled_since
+                               or time.monotonic()) < GAP_TIMEOUT
+
+
+def get_index():
+    index = _loaded['index']
+    sequence = get_sequence()
+    if (index is None or sequence < index.sequence
+            or not catch_up(index, sequence)):
+        # The sequence is read before the recipes, changes committed
+        # in between are replayed on the next call.
+        index = _loaded['index'] = PantryIndex.from_db(sequence)
+    return index
+
+
+def rank_recipes(ingredient_ids, max_missing=None):
+    with _lock:
+        return get_index().rank(ingredient_ids, max_missing)
+
+
+def publish_change(change):
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(change_key(sequence), change, timeout=CHANGE_TIMEOUT)
+
+
+def recipe_ingredients_changed(recipe_id, removed, added, size):
+    change = (recipe_id, tuple(removed), tuple(added), size)
+    transaction.on_commit(lambda: publish_change(change))
+
+
+def recipe_removed(sender, instance, **kwargs):
+    recipe_ingredients_changed(
+        instance.pk,
+        instance.recipe_ingredient_set.values_list('ingredient_id',
+                                                   flat=True),
+        (),
+        0
+    )
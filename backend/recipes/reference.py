@@ -0,0 +1,61 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from .models import Ingredient, Tag
+from .versions import bump_version, get_version
+
+
+ReferenceSnapshot = namedtuple('ReferenceSnapshot',
+                               ('version', 'objects', 'by_pk'))
+
+
+class ReferenceData:
+    # The version lives in the shared cache (see CACHES), so a change
+    # made by one worker invalidates every worker's copy.
+
+    def __init__(self, model, version_name):
+        self.model = model
+        self.version_name = version_name
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        bump_version(self.version_name)
+
+    def snapshot(self):
+        version = get_version(self.version_name)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                objects = tuple(self.model.objects.all())
+                snapshot = ReferenceSnapshot(
+                    version,
+                    objects,
+                    MappingProxyType({obj.pk: obj for obj in objects})
+                )
+                self._snapshot = snapshot
+        return snapshot
+
+    def all(self):
+        return self.snapshot().objects
+
+    def in_bulk(self):
+        return self.snapshot().by_pk
+
+
+REFERENCE_DATA = {
+    Tag: ReferenceData(Tag, 'tags'),
+    Ingredient: ReferenceData(Ingredient, 'ingredients'),
+}
+
+
+def get_reference_data(model):
+    return REFERENCE_DATA[model]
+
+
+def invalidate_reference_data(sender, **kwargs):
+    REFERENCE_DATA[sender].invalidate()
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+SETTINGS = settings.FOODGRAM.get('SIMILAR', {})
+INDEX_PATH = Path(SETTINGS.get('PATH', settings.BASE_DIR / 'similar'))
+NEIGHBORS = SETTINGS.get('NEIGHBORS', 20)
+CURRENT = 'current'
+MANIFEST = 'manifest.json'
+ARRAYS = ('ids', 'neighbors', 'scores')
+KEEP_VERSIONS = 2
+
+_loaded = {'key': None, 'index': None}
+
+
+class SimilarIndex:
+    """Предпосчитанные соседи рецептов.
+
+    Массивы открываются через mmap, поэтому воркеры одного контейнера
+    делят страницы файлов в кэше ОС, а не держат свои копии.
+    ids отсортирован, строка neighbors/scores соответствует рецепту
+    с тем же индексом, пустые позиции заполнены -1.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        for name in ARRAYS:
+            setattr(self, name,
+                    np.load(directory / f'{name}.npy', mmap_mode='r'))
+        with open(directory / MANIFEST) as file:
+            self.manifest = json.load(file)
+
+    def row(self, recipe_id):
+        row = int(np.searchsorted(self.ids, recipe_id))
+        if row < len(self.ids) and self.ids[row] == recipe_id:
+            return row
+        return None
+
+    def similar(self, recipe_id, limit=None):
+        row = self.row(recipe_id)
+        if row is None:
+            return []
+        return [(int(neighbor), float(score)) for neighbor, score in zip(
+            self.neighbors[row, :limit], self.scores[row, :limit]
+        ) if neighbor >= 0]
+
+
+def get_index():
+    pointer = INDEX_PATH / CURRENT
+    try:
+        key = pointer.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _loaded['key'] != key:
+        _loaded['index'] = SimilarIndex(INDEX_PATH / pointer.read_text())
+        _loaded['key'] = key
+    return _loaded['index']
+
+
+def similar_recipe_ids(recipe_id, limit=None):
+    index = get_index()
+    if index is None:
+        return []
+    return [neighbor for neighbor, _ in index.similar(recipe_id, limit)]
+
+
+def write_index(ids, neighbors, scores, manifest):
+    # Every build goes to a new directory and the pointer is replaced
+    # atomically, workers still reading the previous version keep their
+    # mappings even after its files are removed.
+    version = f'v{time.time_ns()}'
+    directory = INDEX_PATH / version
+    directory.mkdir(parents=True)
+    for name, array in zip(ARRAYS, (ids, neighbors, scores)):
+        np.save(directory / f'{name}.npy', array)
+    with open(directory / MANIFEST, 'w') as file:
+        json.dump(manifest, file)
+    pointer = INDEX_PATH / f'{CURRENT}.tmp'
+    pointer.write_text(version)
+    os.replace(pointer, INDEX_PATH / CURRENT)
+    versions = sorted(path for path in INDEX_PATH.iterdir()
+                      if path.is_dir() and path.name.startswith('v'))
+    for path in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(path, ignore_errors=True)
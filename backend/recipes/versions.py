@@ -0,0 +1,69 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'foodgram:version'
+
+
+def version_key(name):
+    return f'{KEY_PREFIX}:{name}'
+
+
+def get_versions(*names):
+    # A version is the timestamp of the last change. A version missing
+    # from the cache is restarted from "now", which can only cause an
+    # extra cache miss, never a stale hit.
+    keys = {version_key(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(version_key(name), time.time()) for name in names]
+
+
+def get_version(name):
+    return get_versions(name)[0]
+
+
+def bump_version(name):
+    transaction.on_commit(
+        lambda: cache.set(version_key(name), time.time(), timeout=None)
+    )
+
+
+def user_version_name(user_id):
+    return f'user:{user_id}'
+
+
+def recipe_changed(sender, **kwargs):
+    bump_version('recipes')
+
+
+def user_changed(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version('users')
+
+
+def recipe_part_changed(sender, action=None, **kwargs):
+    # Shared by post_save/post_delete of recipe parts and m2m_changed
+    # of recipe tags, which only needs to react to completed actions.
+    if action is None or action.startswith('post_'):
+        bump_version('recipes')
+
+
+def user_list_m2m_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if not action.startswith('post_'):
+        return
+    for user_id in (pk_set or ()) if reverse else (instance.pk,):
+        bump_version(user_version_name(user_id))
+
+
+def favorites_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version('favorites')
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# The unique (user_id, recipe_id) constraints of the auto-created through
+# tables cover lookups by user, these composites cover lookups by recipe.
+INDEXES = (
+    ('users_user_favorites', 'users_favorites_recipe_user_idx'),
+    ('users_user_shopping_list', 'users_shopping_recipe_user_idx'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX {name} ON {table} (recipe_id, user_id)',
+            f'DROP INDEX {name}'
+        )
+        for table, name in INDEXES
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_lists_recipe_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_on_read',
+            field=models.BooleanField(default=False, verbose_name='Лента подписчиков собирается при чтении'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
 
 AVATAR_STORAGE = settings.FOODGRAM.get('AVATAR_STORAGE')
 
@@ -21,6 +22,21 @@ class FoodgramUserManager(UserManager):
                                         last_name=last_name,
                                         **extra_fields)
 
+    def with_subscription_flag(self, user):
+        queryset = self.get_queryset()
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_subscribed=Exists(
+                self.model.subscriptions.through.objects.filter(
+                    from_user=user,
+                    to_user=OuterRef('pk')
+                )
+            )
+        )
+
 
 class User(AbstractUser):
     email = models.EmailField(
@@ -60,6 +76,15 @@ class User(AbstractUser):
         verbose_name='Подписки',
         symmetrical=False
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    feed_on_read = models.BooleanField(
+        verbose_name='Лента подписчиков собирается при чтении',
+        default=False
+    )
 
     USERNAME_FIELD = 'email'
 